@@ -0,0 +1,201 @@
+"""
+Servidor local que imita a API de previsão da Open-Meteo, para medir o
+desempenho sem depender da API real.
+
+    python -m benchmarks.fake_open_meteo --port 8099 --latency-ms 80 --error-rate 0.02
+
+Aceita as mesmas listas de coordenadas separadas por vírgula da API real e
+devolve um objeto (uma coordenada) ou uma lista (várias). As previsões são
+sintéticas e determinísticas por coordenada, ou copiadas de uma resposta
+gravada (`--payload`).
+"""
+import argparse
+import asyncio
+import copy
+import csv
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+HOURS = 168
+START = datetime(2024, 5, 1)
+
+# Limites aproximados do Rio Grande do Sul, usados para gerar cidades sintéticas.
+RS_BOUNDS = (-33.7, -27.1, -57.6, -49.7)
+CSV_HEADER = ("city", "city_ascii", "lat", "lng", "country", "iso2", "iso3", "admin_name", "capital", "population", "id")
+
+
+def synthetic_forecast(lat: float, lon: float, hours: int = HOURS) -> dict:
+    """Previsão horária e diária plausível, sempre a mesma para as mesmas coordenadas."""
+    rng = random.Random(f"{lat:.4f},{lon:.4f}")
+    storm_start = rng.randrange(hours)
+    storm_strength = rng.choice((0.0, 0.0, 2.0, 8.0, 20.0))
+    times, temperature, precipitation, wind, probability, pressure, radiation = [], [], [], [], [], [], []
+    for hour in range(hours):
+        time = START + timedelta(hours=hour)
+        daylight = max(0.0, math.sin((time.hour - 6) / 12 * math.pi))
+        storm = storm_strength if storm_start <= hour < storm_start + 6 else 0.0
+        times.append(time.isoformat(timespec="minutes"))
+        temperature.append(round(15 + 8 * daylight + rng.gauss(0, 1.5), 1))
+        precipitation.append(round(max(0.0, rng.gauss(0, 0.3) + storm * rng.random()), 1))
+        wind.append(round(abs(rng.gauss(12, 6)) + storm * 2, 1))
+        probability.append(min(100, int(abs(rng.gauss(20, 15)) + storm * 4)))
+        pressure.append(round(1013 + rng.gauss(0, 4) - storm, 1))
+        radiation.append(round(700 * daylight * rng.uniform(0.4, 1.0), 1))
+    days = hours // 24
+    daily_time = [(START + timedelta(days=day)).date().isoformat() for day in range(days)]
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "hourly": {
+            "time": times,
+            "temperature_2m": temperature,
+            "precipitation": precipitation,
+            "windspeed_10m": wind,
+            "precipitation_probability": probability,
+            "pressure_msl": pressure,
+            "direct_radiation": radiation,
+        },
+        "daily": {
+            "time": daily_time,
+            "temperature_2m_max": [max(temperature[day * 24:(day + 1) * 24]) for day in range(days)],
+            "temperature_2m_min": [min(temperature[day * 24:(day + 1) * 24]) for day in range(days)],
+            "precipitation_sum": [round(sum(precipitation[day * 24:(day + 1) * 24]), 1) for day in range(days)],
+        },
+    }
+
+
+def write_cities_csv(path: str, count: int, admin_name: str = "Rio Grande do Sul", seed: int = 42) -> None:
+    """Grava um `worldcities.csv` sintético com `count` cidades espalhadas pelo estado."""
+    rng = random.Random(seed)
+    min_lat, max_lat, min_lon, max_lon = RS_BOUNDS
+    with open(path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file, quoting=csv.QUOTE_ALL)
+        writer.writerow(CSV_HEADER)
+        for index in range(count):
+            name = f"Cidade {index:04d}"
+            writer.writerow((
+                name, name, round(rng.uniform(min_lat, max_lat), 4), round(rng.uniform(min_lon, max_lon), 4),
+                "Brazil", "BR", "BRA", admin_name, "", int(rng.lognormvariate(9, 1.2)), 1076000000 + index,
+            ))
+
+
+class FakeOpenMeteo:
+    """
+    Aplicação aiohttp que responde como `/v1/forecast`, com latência
+    (`latency_ms` ± `jitter_ms`) e taxa de erros 503 configuráveis.
+    """
+
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 0, error_rate: float = 0.0,
+                 payload: Optional[dict] = None, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.payload = payload
+        self.requests = 0
+        self.errors = 0
+        self.coordinates = 0
+        self._rng = random.Random(seed)
+        self._forecasts: Dict[Tuple[float, float], dict] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    def forecast(self, lat: float, lon: float) -> dict:
+        # Gerada uma vez por coordenada, para que o custo medido seja o do cliente.
+        forecast = self._forecasts.get((lat, lon))
+        if forecast is None:
+            if self.payload is None:
+                forecast = synthetic_forecast(lat, lon)
+            else:
+                forecast = copy.deepcopy(self.payload)
+                forecast["latitude"], forecast["longitude"] = lat, lon
+            self._forecasts[(lat, lon)] = forecast
+        return forecast
+
+    async def handle_forecast(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"error": True, "reason": "simulated failure"}, status=503)
+        try:
+            latitudes = [float(value) for value in request.query["latitude"].split(",")]
+            longitudes = [float(value) for value in request.query["longitude"].split(",")]
+        except (KeyError, ValueError):
+            return web.json_response({"error": True, "reason": "invalid coordinates"}, status=400)
+        if len(latitudes) != len(longitudes):
+            return web.json_response({"error": True, "reason": "coordinate count mismatch"}, status=400)
+        self.coordinates += len(latitudes)
+        forecasts = [self.forecast(lat, lon) for lat, lon in zip(latitudes, longitudes)]
+        return web.json_response(forecasts[0] if len(forecasts) == 1 else forecasts)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/forecast", self.handle_forecast)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Inicia o servidor e retorna a URL de `/v1/forecast` (porta 0 escolhe uma livre)."""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}/v1/forecast"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=50, help="latência média de cada resposta")
+    parser.add_argument("--jitter-ms", type=float, default=10, help="variação máxima da latência")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 503 (0 a 1)")
+    parser.add_argument("--payload", help="resposta gravada da Open-Meteo (JSON) servida para todas as coordenadas")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def server_from_arguments(args: argparse.Namespace) -> FakeOpenMeteo:
+    payload = None
+    if args.payload:
+        with open(args.payload, encoding="utf-8") as payload_file:
+            payload = json.load(payload_file)
+            if isinstance(payload, list):
+                payload = payload[0]
+    return FakeOpenMeteo(args.latency_ms, args.jitter_ms, args.error_rate, payload, args.seed)
+
+
+async def _serve(server: FakeOpenMeteo, host: str, port: int) -> None:
+    url = await server.start(host, port)
+    print(f"Open-Meteo local em {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--cities-csv", help="também grava um CSV de cidades sintéticas neste caminho")
+    parser.add_argument("--city-count", type=int, default=500)
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.cities_csv:
+        write_cities_csv(args.cities_csv, args.city_count)
+        print(f"{args.city_count} cidades gravadas em {args.cities_csv}")
+    try:
+        asyncio.run(_serve(server_from_arguments(args), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Teste de carga de ponta a ponta: sobe o servidor Open-Meteo local e
+`src.main:app` (uvicorn, num diretório temporário com banco próprio) e
+dispara requisições concorrentes contra os endpoints, medindo p50/p95/p99
+e vazão de cada cenário.
+
+    python -m benchmarks.load --cities 500 --concurrency 32 --duration 15 --save load.json
+    python -m benchmarks.load --compare load.json --threshold 0.2
+
+Com `--compare`, termina com código 1 se p95, p99 ou a vazão piorarem além do limite.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from benchmarks import report
+from benchmarks.fake_open_meteo import FakeOpenMeteo, add_server_arguments, server_from_arguments, write_cities_csv
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMNS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "errors")
+
+SCENARIOS: Tuple[Tuple[str, str], ...] = (
+    ("locations", "/locations/rs"),
+    ("filter_status", "/locations/rs/filter?status=PERIGO"),
+    ("filter_range_sort", "/locations/rs/filter?min=precipitation_sum:5&sort_by=precipitation_sum&limit=20"),
+    ("stream_ndjson", "/locations/rs?stream=ndjson"),
+    ("donation_locations", "/donation-locations/"),
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_ready(session: aiohttp.ClientSession, base_url: str, timeout: float) -> None:
+    """Aguarda a aplicação responder com o primeiro snapshot publicado."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/locations/rs") as response:
+                if response.status == 200:
+                    await response.read()
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"A aplicação não ficou pronta em {timeout:.0f}s")
+
+
+async def run_scenario(session: aiohttp.ClientSession, url: str, concurrency: int, duration: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker() -> None:
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    summary = report.summarize(latencies)
+    summary["throughput_rps"] = round(len(latencies) / elapsed, 1)
+    summary["requests"] = len(latencies)
+    summary["errors"] = errors
+    return summary
+
+
+async def run_load(args: argparse.Namespace, workdir: str) -> Dict[str, Dict[str, float]]:
+    server: FakeOpenMeteo = server_from_arguments(args)
+    forecast_url = await server.start()
+    port = _free_port()
+    env = dict(
+        os.environ,
+        OPEN_METEO_URL=forecast_url,
+        CITIES_CSV_PATH=os.path.join(workdir, "worldcities.csv"),
+        # O servidor local só tem cidades do RS e não impõe limite de requisições.
+        SWEEP_REGIONS="RS",
+        UPSTREAM_REQUESTS_PER_MINUTE="0",
+        PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+    )
+    command = [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+    # O banco SQLite (./test.db) e os uploads ficam no diretório temporário.
+    process = subprocess.Popen(command, cwd=workdir, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await wait_until_ready(session, base_url, args.startup_timeout)
+            for name, path in SCENARIOS:
+                if args.scenario and name not in args.scenario:
+                    continue
+                results[name] = await run_scenario(session, base_url + path, args.concurrency, args.duration)
+                print(f"{name}: {results[name]['throughput_rps']} req/s, p99 {results[name]['p99_ms']} ms", file=sys.stderr)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        await server.stop()
+    print(f"Open-Meteo local: {server.requests} requisições, {server.coordinates} coordenadas, {server.errors} erros",
+          file=sys.stderr)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=500, help="quantidade de cidades sintéticas")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="segundos por cenário")
+    parser.add_argument("--workers", type=int, default=1, help="processos do uvicorn")
+    parser.add_argument("--scenario", action="append", choices=[name for name, _ in SCENARIOS],
+                        help="executa só os cenários informados (pode repetir)")
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--save", help="grava os resultados em JSON")
+    parser.add_argument("--compare", help="resultados anteriores (JSON) para detectar regressões")
+    parser.add_argument("--threshold", type=float, default=0.2, help="piora máxima aceita (fração)")
+    add_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        write_cities_csv(os.path.join(workdir, "worldcities.csv"), args.cities)
+        results = asyncio.run(run_load(args, workdir))
+
+    report.print_table(results, COLUMNS)
+    if args.save:
+        report.save(args.save, results)
+    if args.compare:
+        regressions = report.compare(results, args.compare, ("p95_ms", "p99_ms", "throughput_rps"), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSÃO: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Micro-benchmarks das partes críticas: estatísticas, regras de risco,
+gazetteer, filtros e a varredura completa contra o servidor Open-Meteo local.
+
+    python -m benchmarks.micro --cities 500 --repeat 30 --save micro.json
+    python -m benchmarks.micro --compare micro.json --threshold 0.2
+
+Com `--compare`, termina com código 1 se alguma mediana piorar além do limite.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import report
+from benchmarks.fake_open_meteo import FakeOpenMeteo, synthetic_forecast, write_cities_csv
+
+COLUMNS = ("p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    func()  # aquecimento
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return report.summarize(latencies)
+
+
+def run_benchmarks(city_count: int, repeat: int, latency_ms: float) -> Dict[str, Dict[str, float]]:
+    # Os módulos de `src` leem a configuração ao serem importados.
+    from src import services
+    from src.gazetteer import CITIES_CSV_PATH, Gazetteer, get_gazetteer
+    from src.query import CityIndex
+    from src.risk_rules import find_risk_windows
+
+    cities = services.get_cities_rio_grande_do_sul()
+    forecasts = [synthetic_forecast(city["lat"], city["lon"]) for city in cities]
+    results: Dict[str, Dict[str, float]] = {}
+
+    results["calculate_statistics"] = measure(lambda: services.calculate_statistics(forecasts[0]), repeat)
+    results[f"calculate_statistics_for_cities[{city_count}]"] = measure(
+        lambda: services.calculate_statistics_for_cities(forecasts), repeat)
+    results[f"find_risk_windows[{city_count}]"] = measure(lambda: find_risk_windows(forecasts), repeat)
+
+    gazetteer = get_gazetteer()
+    names = [city["city"] for city in cities]
+    results["gazetteer.from_csv"] = measure(lambda: Gazetteer.from_csv(CITIES_CSV_PATH), max(3, repeat // 10))
+    results[f"gazetteer.coordinates[x{len(names)}]"] = measure(
+        lambda: [gazetteer.coordinates(name, services.RS_ADMIN_NAME) for name in names], repeat)
+    results[f"gazetteer.geocode[x{len(names)}]"] = measure(
+        lambda: [gazetteer.geocode(f"Rua A, 10, {name} - RS") for name in names], repeat)
+
+    stats_cities = services.apply_statistics([dict(city) for city in cities], forecasts)
+    index = CityIndex(stats_cities)
+    results["CityIndex.build"] = measure(lambda: CityIndex(stats_cities), repeat)
+    results["CityIndex.query(status)"] = measure(lambda: index.query(status="PERIGO"), repeat)
+    results["CityIndex.query(range+sort)"] = measure(
+        lambda: index.query(minimums={"precipitation_sum": 5}, maximums={"temperature_max": 30},
+                            sort_by="precipitation_sum", limit=20), repeat)
+    results["filter_cities"] = measure(
+        lambda: services.filter_cities(stats_cities, {"precipitation_sum": 5, "wind_speed_max": 20}), repeat)
+
+    async def sweep() -> None:
+        services.forecast_cache.clear()
+        await services.get_statistics_for_all_cities()
+
+    async def sweep_with_server() -> Dict[str, float]:
+        server = FakeOpenMeteo(latency_ms=latency_ms)
+        services.OPEN_METEO_URL = await server.start()
+        try:
+            latencies = []
+            for _ in range(max(3, repeat // 10)):
+                start = time.perf_counter()
+                await sweep()
+                latencies.append((time.perf_counter() - start) * 1000)
+            return report.summarize(latencies)
+        finally:
+            await services.http_client.close()
+            await server.stop()
+
+    results[f"get_statistics_for_all_cities[{city_count}]"] = asyncio.run(sweep_with_server())
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=500, help="quantidade de cidades sintéticas")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=20, help="latência do servidor local na varredura")
+    parser.add_argument("--save", help="grava os resultados em JSON")
+    parser.add_argument("--compare", help="resultados anteriores (JSON) para detectar regressões")
+    parser.add_argument("--threshold", type=float, default=0.2, help="piora máxima aceita na mediana (fração)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "worldcities.csv")
+        write_cities_csv(csv_path, args.cities)
+        os.environ["CITIES_CSV_PATH"] = csv_path
+        os.environ.setdefault("UPSTREAM_REQUESTS_PER_MINUTE", "0")
+        results = run_benchmarks(args.cities, args.repeat, args.latency_ms)
+
+    report.print_table(results, COLUMNS)
+    if args.save:
+        report.save(args.save, results)
+    if args.compare:
+        regressions = report.compare(results, args.compare, ("p50_ms",), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSÃO: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
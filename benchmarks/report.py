@@ -0,0 +1,62 @@
+"""Formatação, gravação e comparação dos resultados dos benchmarks."""
+import json
+import math
+from typing import Dict, List, Sequence
+
+# Métricas em que um valor maior é melhor; nas demais (latências), menor é melhor.
+HIGHER_IS_BETTER = ("throughput_rps",)
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Percentil por interpolação linear sobre valores já ordenados."""
+    if not sorted_values:
+        return math.nan
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies_ms: List[float]) -> Dict[str, float]:
+    values = sorted(latencies_ms)
+    return {
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3) if values else math.nan,
+    }
+
+
+def print_table(results: Dict[str, Dict[str, float]], columns: Sequence[str]) -> None:
+    name_width = max([len("benchmark")] + [len(name) for name in results])
+    print("benchmark".ljust(name_width), *(column.rjust(14) for column in columns))
+    for name, metrics in results.items():
+        print(name.ljust(name_width), *(f"{metrics.get(column, math.nan):14.3f}" for column in columns))
+
+
+def save(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, metrics: Sequence[str],
+            threshold: float) -> List[str]:
+    """
+    Compara com uma execução anterior e retorna as regressões acima de
+    `threshold` (fração, ex.: 0.2 = 20%) nas métricas informadas.
+    """
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in metrics:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None or math.isnan(new):
+                continue
+            change = (old - new) / old if metric in HIGHER_IS_BETTER else (new - old) / old
+            if change > threshold:
+                regressions.append(f"{name} {metric}: {old:.3f} -> {new:.3f} ({change:+.0%})")
+    return regressions
@@ -1,12 +1,182 @@
-from sqlalchemy import create_engine
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.metrics import instrument_engine
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"  # Você pode mudar para o banco de dados de sua preferência
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"  # Mesmo banco, acessado sem bloquear o event loop
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))
+# Arquivo de trava que serializa a criação do esquema entre os workers do mesmo host
+SCHEMA_LOCK_PATH = os.getenv("SCHEMA_LOCK_PATH", "./test.db.schema-lock")
+
+# Engine síncrona, usada apenas para criar e migrar o esquema
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}  # Necessário apenas para SQLite
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    connect_args={"timeout": DB_BUSY_TIMEOUT},
+)
+instrument_engine(async_engine.sync_engine)
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL permite leituras simultâneas a uma escrita
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+
+def ensure_columns(engine, metadata) -> None:
+    """
+    Adiciona às tabelas existentes as colunas (e índices) novos dos modelos,
+    já que o create_all não altera tabelas já criadas.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            missing = [column for column in table.columns if column.name not in existing]
+            for column in missing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                try:
+                    with connection.begin_nested():
+                        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                except OperationalError as exc:
+                    # Outro processo pode ter adicionado a coluna depois da inspeção.
+                    if "duplicate column" not in str(exc).lower():
+                        raise
+            if missing:
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+
+
+# Índices substituídos por outros nos modelos, removidos dos bancos já existentes
+RETIRED_INDEXES = (
+    "ix_forecast_history_city_recorded_at",  # substituído por ix_forecast_history_region_city_recorded_at
+)
+
+
+def drop_retired_indexes(engine) -> None:
+    with engine.begin() as connection:
+        for name in RETIRED_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def ensure_fulltext_index(engine) -> None:
+    """Cria (no SQLite) o índice FTS5 sobre nome e endereço dos pontos de coleta, mantido por triggers."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'donation_locations_fts'")
+        ).first()
+        if exists:
+            return
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS donation_locations_fts USING fts5("
+            "name, location, content='donation_locations', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS donation_locations_fts_insert AFTER INSERT ON donation_locations BEGIN "
+            "INSERT INTO donation_locations_fts(rowid, name, location) VALUES (new.id, new.name, new.location); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS donation_locations_fts_delete AFTER DELETE ON donation_locations BEGIN "
+            "INSERT INTO donation_locations_fts(donation_locations_fts, rowid, name, location) "
+            "VALUES ('delete', old.id, old.name, old.location); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS donation_locations_fts_update AFTER UPDATE OF name, location ON donation_locations BEGIN "
+            "INSERT INTO donation_locations_fts(donation_locations_fts, rowid, name, location) "
+            "VALUES ('delete', old.id, old.name, old.location); "
+            "INSERT INTO donation_locations_fts(rowid, name, location) VALUES (new.id, new.name, new.location); END"
+        ))
+        connection.execute(text("INSERT INTO donation_locations_fts(donation_locations_fts) VALUES ('rebuild')"))
+
+
+def ensure_donation_version(engine) -> None:
+    """
+    Cria o contador de alterações dos pontos de coleta, incrementado por
+    triggers. Cada worker compara o contador com o do seu índice espacial e o
+    recarrega quando outro processo incluiu, moveu ou removeu um ponto.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS donation_locations_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)"
+        ))
+        connection.execute(text("INSERT OR IGNORE INTO donation_locations_version (id, version) VALUES (1, 0)"))
+        for name, event in (
+            ("insert", "INSERT"),
+            ("delete", "DELETE"),
+            ("update", "UPDATE OF latitude, longitude"),
+        ):
+            connection.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS donation_locations_version_{name} AFTER {event} ON donation_locations BEGIN "
+                "UPDATE donation_locations_version SET version = version + 1 WHERE id = 1; END"
+            ))
+
+
+@contextmanager
+def schema_lock(path: str = SCHEMA_LOCK_PATH):
+    """
+    Trava exclusiva (flock) enquanto o esquema é criado: com vários workers,
+    cada um inspeciona e altera o esquema só depois que o anterior terminou.
+    """
+    try:
+        import fcntl
+    except ImportError:  # Sem flock (Windows): um único processo por banco
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def init_db(metadata) -> None:
+    """Cria as tabelas e aplica as migrações simples do esquema. Executado uma vez na inicialização."""
+    with schema_lock():
+        metadata.create_all(bind=engine)
+        ensure_columns(engine, metadata)
+        drop_retired_indexes(engine)
+        ensure_fulltext_index(engine)
+        ensure_donation_version(engine)
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
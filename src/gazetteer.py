@@ -0,0 +1,186 @@
+import csv
+import functools
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CITIES_CSV_PATH = os.getenv("CITIES_CSV_PATH", "data/worldcities.csv")
+COLUMNS = ("city", "admin_name", "country", "lat", "lng", "population")
+DEFAULT_COUNTRY = "Brazil"
+
+BRAZIL_STATES = {
+    "AC": "Acre", "AL": "Alagoas", "AP": "Amapá", "AM": "Amazonas", "BA": "Bahia",
+    "CE": "Ceará", "DF": "Distrito Federal", "ES": "Espírito Santo", "GO": "Goiás",
+    "MA": "Maranhão", "MT": "Mato Grosso", "MS": "Mato Grosso do Sul", "MG": "Minas Gerais",
+    "PA": "Pará", "PB": "Paraíba", "PR": "Paraná", "PE": "Pernambuco", "PI": "Piauí",
+    "RJ": "Rio de Janeiro", "RN": "Rio Grande do Norte", "RS": "Rio Grande do Sul",
+    "RO": "Rondônia", "RR": "Roraima", "SC": "Santa Catarina", "SP": "São Paulo",
+    "SE": "Sergipe", "TO": "Tocantins",
+}
+
+_ADDRESS_SEPARATORS = re.compile(r"[,;/|\n]|\s+[-–]\s+")
+
+
+def normalize_name(name: str) -> str:
+    """Normaliza um nome para comparação sem diferenciar maiúsculas nem acentos."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+
+
+def state_key(state: str) -> str:
+    """Chave normalizada de um estado, aceitando o nome ou a sigla (UF)."""
+    state = state.strip()
+    return normalize_name(BRAZIL_STATES.get(state.upper(), state))
+
+
+def find_state_key(text: str) -> Optional[str]:
+    """Procura num endereço livre a sigla ou o nome de um estado brasileiro."""
+    state_keys = {normalize_name(name) for name in BRAZIL_STATES.values()}
+    for part in reversed(_ADDRESS_SEPARATORS.split(text)):
+        part = part.strip()
+        if part.upper() in BRAZIL_STATES:
+            return normalize_name(BRAZIL_STATES[part.upper()])
+        if normalize_name(part) in state_keys:
+            return normalize_name(part)
+    return None
+
+
+def compiled_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".npz"
+
+
+class Gazetteer:
+    """
+    Cidades do `worldcities.csv` em colunas NumPy, com índice por nome
+    normalizado para buscas O(1).
+    """
+
+    def __init__(self, city: np.ndarray, admin_name: np.ndarray, country: np.ndarray,
+                 lat: np.ndarray, lng: np.ndarray, population: np.ndarray):
+        self.city = city
+        self.admin_name = admin_name
+        self.country = country
+        self.lat = lat
+        self.lng = lng
+        self.population = population
+        self.admin_keys = np.array([normalize_name(name) for name in admin_name.tolist()])
+        self._name_index: Dict[str, List[int]] = {}
+        for row, name in enumerate(city.tolist()):
+            self._name_index.setdefault(normalize_name(name), []).append(row)
+        self._admin_cache: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.city)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Gazetteer":
+        columns: Dict[str, list] = {column: [] for column in COLUMNS}
+        with open(path, newline="", encoding="utf-8") as csv_file:
+            for row in csv.DictReader(csv_file):
+                columns["city"].append(row["city"])
+                columns["admin_name"].append(row.get("admin_name") or "")
+                columns["country"].append(row.get("country") or "")
+                columns["lat"].append(float(row["lat"]))
+                columns["lng"].append(float(row["lng"]))
+                columns["population"].append(float(row["population"]) if row.get("population") else np.nan)
+        return cls(
+            np.array(columns["city"], dtype=str),
+            np.array(columns["admin_name"], dtype=str),
+            np.array(columns["country"], dtype=str),
+            np.array(columns["lat"], dtype=float),
+            np.array(columns["lng"], dtype=float),
+            np.array(columns["population"], dtype=float),
+        )
+
+    @classmethod
+    def from_compiled(cls, path: str) -> "Gazetteer":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(*(data[column] for column in COLUMNS))
+
+    def save(self, path: str) -> None:
+        np.savez(path, city=self.city, admin_name=self.admin_name, country=self.country,
+                 lat=self.lat, lng=self.lng, population=self.population)
+
+    def rows_in(self, admin_name: str) -> np.ndarray:
+        """Índices das linhas de uma divisão administrativa (estado), na ordem do arquivo."""
+        key = normalize_name(admin_name)
+        rows = self._admin_cache.get(key)
+        if rows is None:
+            rows = np.flatnonzero(self.admin_keys == key)
+            self._admin_cache[key] = rows
+        return rows
+
+    def lookup(self, name: str, admin_name: Optional[str] = None) -> Optional[int]:
+        """Retorna a primeira linha com o nome informado, opcionalmente restrita a um estado."""
+        rows = self._name_index.get(normalize_name(name), [])
+        if admin_name is not None:
+            admin_key = normalize_name(admin_name)
+            rows = [row for row in rows if self.admin_keys[row] == admin_key]
+        return rows[0] if rows else None
+
+    def coordinates(self, name: str, admin_name: Optional[str] = None) -> Tuple[Optional[float], Optional[float]]:
+        row = self.lookup(name, admin_name)
+        if row is None:
+            return None, None
+        return float(self.lat[row]), float(self.lng[row])
+
+    def geocode(self, text: str, country: str = DEFAULT_COUNTRY) -> Optional[int]:
+        """
+        Localiza a cidade citada num endereço livre (ex.: "Rua A, 10, Canoas - RS"),
+        procurando cada trecho do texto do fim para o começo e preferindo cidades
+        do país informado. Se o endereço cita um estado (sigla ou nome), só
+        cidades desse estado são aceitas. Retorna a linha no gazetteer ou None.
+        """
+        state = find_state_key(text)
+        parts = [part for part in _ADDRESS_SEPARATORS.split(text) if part.strip()]
+        for part in reversed(parts + [text] if len(parts) > 1 else parts):
+            rows = self._name_index.get(normalize_name(part), [])
+            if state is not None:
+                rows = [row for row in rows if self.admin_keys[row] == state]
+            if rows:
+                preferred = [row for row in rows if self.country[row] == country]
+                return (preferred or rows)[0]
+        return None
+
+    def population_in(self, admin_name: str) -> float:
+        """População somada das cidades de um estado (cidades sem população contam como zero)."""
+        return float(np.nansum(self.population[self.rows_in(admin_name)]))
+
+    def population_order(self, admin_name: str) -> np.ndarray:
+        """Posições das cidades de `cities_in(admin_name)` da mais populosa para a menos populosa."""
+        population = self.population[self.rows_in(admin_name)]
+        return np.argsort(-np.nan_to_num(population, nan=-1.0), kind="stable")
+
+    def cities_in(self, admin_name: str) -> List[dict]:
+        """Lista de dicionários (novos a cada chamada) com nome e coordenadas das cidades de um estado."""
+        rows = self.rows_in(admin_name)
+        return [
+            {"city": city, "lat": lat, "lon": lon}
+            for city, lat, lon in zip(self.city[rows].tolist(), self.lat[rows].tolist(), self.lng[rows].tolist())
+        ]
+
+
+def load_gazetteer(csv_path: str = CITIES_CSV_PATH) -> Gazetteer:
+    """Carrega a versão compilada, se estiver atualizada; caso contrário lê o CSV."""
+    npz_path = compiled_path(csv_path)
+    if os.path.exists(npz_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(npz_path) >= os.path.getmtime(csv_path)
+    ):
+        return Gazetteer.from_compiled(npz_path)
+    return Gazetteer.from_csv(csv_path)
+
+
+@functools.lru_cache(maxsize=None)
+def get_gazetteer() -> Gazetteer:
+    """Gazetteer carregado uma única vez por processo."""
+    return load_gazetteer()
+
+
+if __name__ == "__main__":
+    # Compila o CSV em formato binário durante o build: python -m src.gazetteer
+    gazetteer = Gazetteer.from_csv(CITIES_CSV_PATH)
+    gazetteer.save(compiled_path(CITIES_CSV_PATH))
+    print(f"{len(gazetteer)} cidades compiladas em {compiled_path(CITIES_CSV_PATH)}")
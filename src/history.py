@@ -0,0 +1,147 @@
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import models
+from src.gazetteer import state_key
+from src.weather_stats import HOURLY_FIELDS, pack_series
+
+HISTORY_RETENTION_DAYS = int(os.getenv("HISTORY_RETENTION_DAYS", "30"))
+HISTORY_COMPACT_AFTER_HOURS = int(os.getenv("HISTORY_COMPACT_AFTER_HOURS", "48"))
+# Antes da varredura por regiões só o Rio Grande do Sul era gravado, sem a região.
+LEGACY_REGION = state_key("Rio Grande do Sul")
+
+
+def encode_hourly(weather_data: dict) -> bytes:
+    """Codifica as séries horárias como uma matriz float32 (campos × horas) comprimida."""
+    hourly = weather_data.get("hourly") or {}
+    matrix = pack_series([hourly.get(field) for field in HOURLY_FIELDS]).T.astype(np.float32)
+    return zlib.compress(np.ascontiguousarray(matrix).tobytes())
+
+
+def decode_hourly(blob: bytes, start: Optional[str]) -> dict:
+    """Reconstrói as séries horárias (com None nas horas sem valor) a partir de `encode_hourly`."""
+    matrix = np.frombuffer(zlib.decompress(blob), dtype=np.float32).reshape(len(HOURLY_FIELDS), -1)
+    hourly = {
+        field: [None if np.isnan(value) else round(float(value), 2) for value in row]
+        for field, row in zip(HOURLY_FIELDS, matrix)
+    }
+    if start:
+        first_hour = datetime.fromisoformat(start)
+        hourly["time"] = [(first_hour + timedelta(hours=hour)).isoformat(timespec="minutes") for hour in range(matrix.shape[1])]
+    return hourly
+
+
+async def record_sweep(db: AsyncSession, region: str, cities: List[dict], forecasts: List[Optional[dict]],
+                       recorded_at: datetime) -> int:
+    """
+    Grava as estatísticas e séries horárias das cidades de uma varredura da
+    região (chave normalizada do estado); retorna quantas foram gravadas.
+    """
+    records = []
+    for city, weather_data in zip(cities, forecasts):
+        stats = city.get("stats")
+        if not stats or not weather_data:
+            continue
+        times = (weather_data.get("hourly") or {}).get("time") or [None]
+        records.append(models.ForecastRecord(
+            region=region,
+            city=city["city"],
+            recorded_at=recorded_at,
+            risk_level=stats.get("risk_level"),
+            stats=json.dumps(stats, ensure_ascii=False),
+            hourly_start=times[0],
+            hourly=encode_hourly(weather_data),
+        ))
+    db.add_all(records)
+    await db.commit()
+    return len(records)
+
+
+def _serialize(record: models.ForecastRecord, include_hourly: bool) -> dict:
+    result = {
+        "region": record.region,
+        "city": record.city,
+        "recorded_at": record.recorded_at.isoformat(),
+        "risk_level": record.risk_level,
+        "stats": json.loads(record.stats),
+    }
+    if include_hourly and record.hourly is not None:
+        result["hourly"] = decode_hourly(record.hourly, record.hourly_start)
+    return result
+
+
+async def get_city_history(db: AsyncSession, region: str, city: str, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None, include_hourly: bool = False) -> List[dict]:
+    """Histórico das previsões de uma cidade da região no intervalo informado, em ordem cronológica."""
+    query = select(models.ForecastRecord).where(models.ForecastRecord.region == region, models.ForecastRecord.city == city)
+    if start is not None:
+        query = query.where(models.ForecastRecord.recorded_at >= start)
+    if end is not None:
+        query = query.where(models.ForecastRecord.recorded_at <= end)
+    result = await db.execute(query.order_by(models.ForecastRecord.recorded_at))
+    return [_serialize(record, include_hourly) for record in result.scalars()]
+
+
+async def get_last_known_good(db: AsyncSession, region: str, city: str, include_hourly: bool = True) -> Optional[dict]:
+    """Última previsão gravada com sucesso para a cidade da região."""
+    result = await db.execute(
+        select(models.ForecastRecord)
+        .where(models.ForecastRecord.region == region, models.ForecastRecord.city == city)
+        .order_by(models.ForecastRecord.recorded_at.desc())
+        .limit(1)
+    )
+    record = result.scalars().first()
+    return _serialize(record, include_hourly) if record else None
+
+
+async def fill_from_history(db: AsyncSession, region: str, cities: List[dict]) -> int:
+    """
+    Preenche as cidades da região sem estatísticas com a última previsão
+    conhecida; retorna quantas foram preenchidas.
+    """
+    filled = 0
+    for city in cities:
+        if city.get("stats"):
+            continue
+        last = await get_last_known_good(db, region, city["city"], include_hourly=False)
+        if last is not None:
+            city["stats"] = dict(last["stats"], stale=True, recorded_at=last["recorded_at"])
+            filled += 1
+    return filled
+
+
+async def compact_history(db: AsyncSession, now: Optional[datetime] = None) -> int:
+    """
+    Remove registros além da retenção e, entre os mais antigos que
+    HISTORY_COMPACT_AFTER_HOURS, mantém apenas o último de cada cidade (de cada
+    região) por dia.
+    Retorna o número de registros removidos.
+    """
+    now = now or datetime.utcnow()
+    table = models.ForecastRecord
+    expired = await db.execute(delete(table).where(table.recorded_at < now - timedelta(days=HISTORY_RETENTION_DAYS)))
+
+    compact_before = now - timedelta(hours=HISTORY_COMPACT_AFTER_HOURS)
+    keep = (
+        select(func.max(table.id))
+        .where(table.recorded_at < compact_before)
+        .group_by(table.region, table.city, func.date(table.recorded_at))
+    )
+    compacted = await db.execute(delete(table).where(table.recorded_at < compact_before, table.id.notin_(keep)))
+    await db.commit()
+    return expired.rowcount + compacted.rowcount
+
+
+async def assign_legacy_region(db: AsyncSession) -> int:
+    """Atribui ao Rio Grande do Sul os registros gravados antes da coluna `region`; retorna quantos foram alterados."""
+    table = models.ForecastRecord
+    result = await db.execute(update(table).where(table.region.is_(None)).values(region=LEGACY_REGION))
+    await db.commit()
+    return result.rowcount
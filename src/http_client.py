@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Optional
+
+import aiohttp
+
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_MAX_CONCURRENCY = int(os.getenv("HTTP_MAX_CONCURRENCY", "16"))
+HTTP_REQUEST_TIMEOUT = float(os.getenv("HTTP_REQUEST_TIMEOUT", "10"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "8"))
+# Orçamento global de requisições à API de previsão (0 desativa o limite).
+UPSTREAM_REQUESTS_PER_MINUTE = float(os.getenv("UPSTREAM_REQUESTS_PER_MINUTE", "500"))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", str(HTTP_MAX_CONCURRENCY)))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Limita a taxa de operações a `rate_per_minute`, permitindo rajadas de até
+    `burst`. Quem chega primeiro é atendido primeiro, então a ordem em que as
+    requisições são criadas define a prioridade delas.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Aguarda uma ficha disponível; retorna quanto tempo esperou, em segundos."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        start = time.monotonic()
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+        return time.monotonic() - start
+
+
+class HttpClient:
+    """
+    Sessão HTTP compartilhada por toda a aplicação, com limite de conexões,
+    concorrência limitada por semáforo, timeout por requisição, orçamento de
+    requisições por minuto (`budget`, inclusive para as novas tentativas) e
+    novas tentativas com backoff exponencial e jitter para 429/5xx.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = HTTP_MAX_CONCURRENCY,
+        request_timeout: float = HTTP_REQUEST_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        budget: Optional[TokenBucket] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.budget = budget
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HttpClient não foi iniciado")
+        return self._session
+
+    async def start(self) -> None:
+        """Cria a sessão e o pool de conexões, caso ainda não existam."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            use_dns_cache=True,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._semaphore = None
+
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial com jitter completo."""
+        return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+    async def get_json(self, url: str) -> Optional[Any]:
+        """
+        Faz um GET e retorna o JSON da resposta, ou None se a requisição falhar
+        depois de esgotadas as tentativas.
+        """
+        await self.start()
+        for attempt in range(self.max_retries + 1):
+            retry_after: Optional[float] = None
+            status = "error"
+            if self.budget is not None:
+                metrics.upstream_budget_wait.observe(await self.budget.acquire())
+            try:
+                async with self._semaphore:
+                    metrics.upstream_requests_in_flight.inc()
+                    start = time.perf_counter()
+                    try:
+                        async with self.session.get(url) as response:
+                            status = str(response.status)
+                            if response.status == 200:
+                                return await response.json()
+                            if response.status not in RETRY_STATUSES:
+                                logger.warning("GET %s retornou %d", url, response.status)
+                                return None
+                            retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                            logger.info("GET %s retornou %d (tentativa %d)", url, response.status, attempt + 1)
+                    finally:
+                        metrics.upstream_requests_in_flight.dec()
+                        metrics.upstream_request_duration.labels(status).observe(time.perf_counter() - start)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                logger.info("GET %s falhou (tentativa %d): %r", url, attempt + 1, exc)
+            if attempt < self.max_retries:
+                await asyncio.sleep(retry_after if retry_after is not None else self._backoff(attempt))
+        logger.warning("GET %s falhou após %d tentativas", url, self.max_retries + 1)
+        return None
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return min(HTTP_BACKOFF_MAX, max(0.0, float(value)))
+    except ValueError:
+        return None
+
+
+upstream_budget = TokenBucket(UPSTREAM_REQUESTS_PER_MINUTE, UPSTREAM_BURST) if UPSTREAM_REQUESTS_PER_MINUTE > 0 else None
+
+http_client = HttpClient(budget=upstream_budget)
@@ -1,9 +1,68 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from src import history, metrics, models, services, uploads
+from src.database import AsyncSessionLocal, async_engine, init_db
+from src.gazetteer import get_gazetteer
+from src.http_client import http_client
 from src.routers import locations, users
+from src.snapshot import SNAPSHOT_RETRY_AFTER, SnapshotUnavailable, run_refresh_loop, sweep_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_donation_index() -> None:
+    """Preenche coordenadas, cidade e estado dos pontos de coleta antigos e carrega o índice espacial."""
+    try:
+        async with AsyncSessionLocal() as db:
+            updated = await services.backfill_donation_locations(db)
+            await services.load_donation_index(db)
+        if updated:
+            logger.info("%d pontos de coleta geocodificados", updated)
+    except Exception:
+        logger.exception("Falha ao geocodificar os pontos de coleta")
+
+
+async def run_background_work() -> None:
+    """
+    Carrega o gazetteer numa thread, sem bloquear o event loop nem atrasar a
+    inicialização, e então aquece o índice de pontos de coleta e inicia as
+    varreduras agendadas das regiões, priorizadas pela população de cada uma.
+    """
+    try:
+        sweep_scheduler.load_populations(await asyncio.to_thread(get_gazetteer))
+    except Exception:
+        logger.exception("Falha ao carregar o gazetteer")
+    await asyncio.gather(warm_donation_index(), run_refresh_loop())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Esquema do banco criado uma única vez, antes de aceitar requisições
+    await asyncio.to_thread(init_db, models.Base.metadata)
+    async with AsyncSessionLocal() as db:
+        await history.assign_legacy_region(db)
+    # Sessão HTTP compartilhada durante toda a vida da aplicação
+    await http_client.start()
+    background_task = asyncio.create_task(run_background_work())
+    lag_task = asyncio.create_task(metrics.monitor_event_loop_lag())
+    try:
+        yield
+    finally:
+        for task in (background_task, lag_task):
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        await http_client.close()
+        await async_engine.dispose()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure o middleware de CORS
 app.add_middleware(
@@ -14,9 +73,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Limita o corpo do upload antes de o formulário ser lido e gravado em disco
+app.add_middleware(uploads.BodySizeLimitMiddleware, paths=("/upload-identity-photo/",))
+
+# Mede a duração das requisições (e, opcionalmente, informa o Server-Timing)
+app.add_middleware(metrics.TimingMiddleware)
+
+
+@app.exception_handler(SnapshotUnavailable)
+async def snapshot_unavailable(request: Request, exc: SnapshotUnavailable) -> JSONResponse:
+    """O líder ainda não publicou o snapshot da região; o cliente deve tentar de novo."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Snapshot not available yet, try again later"},
+        headers={"Retry-After": str(SNAPSHOT_RETRY_AFTER)},
+    )
+
+
 app.include_router(locations.router)
 app.include_router(users.router)
 
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Métricas da aplicação no formato de texto do Prometheus."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -27,6 +27,34 @@ class DonationLocation(Base):
     hygiene = Column(Boolean, default=False)
     food = Column(Boolean, default=False)
     clothes = Column(Boolean, default=False)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    city_key = Column(String, nullable=True, index=True)  # nome da cidade normalizado
+    state_key = Column(String, nullable=True)  # nome do estado normalizado
     collector_id = Column(Integer, ForeignKey('users.id'))
 
     collector = relationship("User", back_populates="locations")
+
+    __table_args__ = (Index('ix_donation_locations_state_key_id', 'state_key', 'id'),)
+
+class ForecastRecord(Base):
+    __tablename__ = 'forecast_history'
+
+    id = Column(Integer, primary_key=True, index=True)
+    region = Column(String, nullable=True)  # estado (admin_name) normalizado, ex.: "rio grande do sul"
+    city = Column(String, nullable=False)
+    recorded_at = Column(DateTime, nullable=False)
+    risk_level = Column(String)
+    stats = Column(Text)  # JSON com as estatísticas da cidade
+    hourly_start = Column(String)  # horário da primeira hora da série
+    hourly = Column(LargeBinary)  # séries horárias em float32, comprimidas com zlib
+
+    __table_args__ = (Index('ix_forecast_history_region_city_recorded_at', 'region', 'city', 'recorded_at'),)
+
+
+class SnapshotLease(Base):
+    __tablename__ = 'snapshot_leases'
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)  # identificador do processo que detém a concessão
+    expires_at = Column(Float, nullable=False)  # instante (time.time()) em que a concessão expira
@@ -0,0 +1,134 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.gazetteer import normalize_name
+
+NUMERIC_FIELDS = (
+    "precipitation_sum",
+    "temperature_min",
+    "temperature_max",
+    "wind_speed_max",
+    "precipitation_probability_avg",
+    "pressure_avg",
+    "direct_radiation_avg",
+)
+
+
+def _numeric(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _within(value, minimum: Optional[float], maximum: Optional[float]) -> bool:
+    return (
+        _numeric(value)
+        and (minimum is None or value >= minimum)
+        and (maximum is None or value <= maximum)
+    )
+
+
+class CityIndex:
+    """
+    Índices sobre as estatísticas das cidades: hash por nível de risco e por
+    nome, e índices ordenados (criados sob demanda) para os campos numéricos.
+    """
+
+    def __init__(self, cities: Sequence[dict]):
+        self.cities = tuple(cities)
+        self._by_risk: Dict[str, List[int]] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        for position, city in enumerate(self.cities):
+            risk_level = city.get("stats", {}).get("risk_level")
+            if risk_level is not None:
+                self._by_risk.setdefault(risk_level, []).append(position)
+            self._by_name.setdefault(normalize_name(city.get("city", "")), []).append(position)
+        self._sorted: Dict[str, Tuple[List[float], List[int]]] = {}
+
+    def _sorted_index(self, field: str) -> Tuple[List[float], List[int]]:
+        """Valores do campo em ordem crescente e as posições correspondentes; cidades sem o valor ficam de fora."""
+        index = self._sorted.get(field)
+        if index is None:
+            pairs = sorted(
+                (city["stats"][field], position)
+                for position, city in enumerate(self.cities)
+                if _numeric(city.get("stats", {}).get(field))
+            )
+            index = ([value for value, _ in pairs], [position for _, position in pairs])
+            self._sorted[field] = index
+        return index
+
+    def _range(self, field: str, minimum: Optional[float], maximum: Optional[float]) -> Tuple[int, int]:
+        values, _ = self._sorted_index(field)
+        start = 0 if minimum is None else bisect_left(values, minimum)
+        end = len(values) if maximum is None else bisect_right(values, maximum)
+        return start, max(start, end)
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        city: Optional[str] = None,
+        minimums: Optional[Dict[str, float]] = None,
+        maximums: Optional[Dict[str, float]] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        limit: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Retorna as cidades que satisfazem todos os predicados (limites inclusivos).
+        Sem `sort_by` a ordem original é mantida; com `sort_by` as cidades sem
+        o valor do campo são excluídas.
+        """
+        positions = self.query_positions(status, city, minimums, maximums, sort_by, descending, limit)
+        return [self.cities[position] for position in positions]
+
+    def query_positions(
+        self,
+        status: Optional[str] = None,
+        city: Optional[str] = None,
+        minimums: Optional[Dict[str, float]] = None,
+        maximums: Optional[Dict[str, float]] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        limit: Optional[int] = None,
+    ) -> List[int]:
+        """Como `query`, mas retorna as posições das cidades em `self.cities`."""
+        minimums = minimums or {}
+        maximums = maximums or {}
+        candidates: Optional[set] = None
+
+        if status is not None:
+            candidates = set(self._by_risk.get(status, ()))
+        if city is not None:
+            matches = set(self._by_name.get(normalize_name(city), ()))
+            candidates = matches if candidates is None else candidates & matches
+
+        ranges = {field: self._range(field, minimums.get(field), maximums.get(field))
+                  for field in set(minimums) | set(maximums)}
+        if ranges:
+            # Parte do intervalo mais seletivo e confere os demais pelos limites.
+            field = min(ranges, key=lambda name: ranges[name][1] - ranges[name][0])
+            start, end = ranges.pop(field)
+            matches = set(self._sorted_index(field)[1][start:end])
+            candidates = matches if candidates is None else candidates & matches
+            for field in ranges:
+                candidates = {
+                    position for position in candidates
+                    if _within(self.cities[position]["stats"].get(field), minimums.get(field), maximums.get(field))
+                }
+
+        if sort_by is not None:
+            positions: Iterable[int] = self._sorted_index(sort_by)[1]
+            if descending:
+                positions = reversed(positions)
+            if candidates is not None:
+                positions = (position for position in positions if position in candidates)
+        elif candidates is not None:
+            positions = sorted(candidates)
+        else:
+            positions = range(len(self.cities))
+
+        results = []
+        for position in positions:
+            if limit is not None and len(results) >= limit:
+                break
+            results.append(position)
+        return results
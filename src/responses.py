@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+import orjson
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # O brotli é opcional; sem ele só o gzip é oferecido.
+    brotli = None
+
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+# Respostas montadas sob demanda só são comprimidas a partir deste tamanho.
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+
+JSON_MEDIA_TYPE = "application/json"
+
+# Corpos podem ser bytes ou fatias de um arquivo mapeado em memória.
+Body = Union[bytes, memoryview]
+_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(value) -> bytes:
+    """Serializa em JSON (UTF-8), aceitando também escalares e arrays do NumPy."""
+    return orjson.dumps(value, option=_JSON_OPTIONS)
+
+
+def join_array(fragments: Iterable[Body]) -> bytes:
+    """Monta um array JSON a partir de elementos já serializados."""
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def content_etag(*parts: bytes) -> str:
+    return hashlib.blake2b(b"\0".join(parts), digest_size=16).hexdigest()
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    """Corpo pronto para envio, com as variantes comprimidas e a ETag forte do conteúdo."""
+    identity: Body
+    etag: str
+    gzip: Optional[Body] = None
+    brotli: Optional[Body] = None
+
+    def variants(self) -> Dict[str, Body]:
+        available = {"identity": self.identity}
+        if self.gzip is not None:
+            available["gzip"] = self.gzip
+        if self.brotli is not None:
+            available["br"] = self.brotli
+        return available
+
+
+def encode_body(body: bytes, etag: Optional[str] = None, compress: bool = True, use_brotli: bool = True) -> EncodedBody:
+    """Calcula a ETag e, se `compress`, as versões gzip e brotli do corpo."""
+    etag = etag or content_etag(body)
+    if not compress:
+        return EncodedBody(body, etag)
+    return EncodedBody(
+        identity=body,
+        etag=etag,
+        gzip=gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0),
+        brotli=brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY) if brotli is not None and use_brotli else None,
+    )
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Sequence[str]) -> str:
+    """Escolhe a compressão disponível aceita pelo cliente (br antes de gzip em caso de empate)."""
+    if not accept_encoding:
+        return "identity"
+    accepted = _accepted_encodings(accept_encoding)
+    candidates = [
+        (accepted.get(encoding, accepted.get("*", 0.0)), encoding)
+        for encoding in ("br", "gzip") if encoding in available
+    ]
+    candidates = [candidate for candidate in candidates if candidate[0] > 0]
+    if not candidates:
+        return "identity"
+    return max(candidates, key=lambda candidate: candidate[0])[1]
+
+
+def _etag_for(etag: str, encoding: str) -> str:
+    # Cada codificação é uma representação diferente e precisa de ETag forte própria.
+    return f'"{etag}"' if encoding == "identity" else f'"{etag}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara o If-None-Match com a ETag do conteúdo em qualquer uma das codificações."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate == etag or candidate in (f"{etag}-gzip", f"{etag}-br"):
+            return True
+    return False
+
+
+def encoded_response(request: Request, encoded: EncodedBody, headers: Optional[Dict[str, str]] = None,
+                     media_type: str = JSON_MEDIA_TYPE) -> Response:
+    """
+    Responde com os bytes já prontos na codificação aceita pelo cliente, ou com
+    304 se o If-None-Match corresponder à ETag do conteúdo.
+    """
+    variants = encoded.variants()
+    encoding = choose_encoding(request.headers.get("accept-encoding"), tuple(variants))
+    response_headers = dict(headers or {})
+    response_headers["ETag"] = _etag_for(encoded.etag, encoding)
+    response_headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request.headers.get("if-none-match"), encoded.etag):
+        return Response(status_code=304, headers=response_headers)
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+    return Response(content=variants[encoding], media_type=media_type, headers=response_headers)
+
+
+def json_fragments_response(request: Request, fragments: Sequence[Body], etag: str,
+                            headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Resposta com um array JSON montado de elementos pré-serializados. O corpo só
+    é montado se não couber um 304, e só é comprimido se for grande e o cliente aceitar gzip.
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return encoded_response(request, EncodedBody(b"", etag), headers)
+    body = join_array(fragments)
+    compress = (len(body) >= RESPONSE_COMPRESS_MIN_BYTES
+                and choose_encoding(request.headers.get("accept-encoding"), ("gzip",)) == "gzip")
+    encoded = EncodedBody(body, etag, gzip=gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0) if compress else None)
+    return encoded_response(request, encoded, headers)
@@ -0,0 +1,252 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.weather_stats import HOURLY_FIELDS, pack_hourly
+
+RISK_RULES_PATH = os.getenv("RISK_RULES_PATH")
+# Acrescenta às regras padrão as regras horárias de HOURLY_RULES (chuva em 3 h, ventania...).
+RISK_HOURLY_RULES = os.getenv("RISK_HOURLY_RULES", "").lower() in ("1", "true", "yes")
+
+# Níveis de risco em ordem crescente de gravidade.
+SEVERITY_LEVELS = ("SEGURO", "ATENÇÃO", "PERIGO")
+
+OPERATORS = {
+    ">=": np.greater_equal,
+    ">": np.greater,
+    "<=": np.less_equal,
+    "<": np.less,
+}
+AGGREGATES = ("value", "sum", "max", "min", "mean")
+
+# Estatística do horizonte completo (ver weather_stats) usada por uma regra com `window` = 0.
+HORIZON_STATS = {
+    ("precipitation", "sum"): "precipitation_sum",
+    ("temperature_2m", "min"): "temperature_min",
+    ("temperature_2m", "max"): "temperature_max",
+    ("windspeed_10m", "max"): "wind_speed_max",
+    ("precipitation_probability", "mean"): "precipitation_probability_avg",
+    ("pressure_msl", "mean"): "pressure_avg",
+    ("direct_radiation", "mean"): "direct_radiation_avg",
+}
+
+
+@dataclass(frozen=True)
+class RiskRule:
+    """
+    Condição avaliada hora a hora sobre um campo horário. Com `window` > 1 o
+    valor comparado é a agregação (`sum`, `max`, `min` ou `mean`) das últimas
+    `window` horas, ex.: chuva acumulada em 3 h >= 30 mm. Com `window` = 0 a
+    condição vale para o horizonte completo e compara a estatística da cidade
+    (HORIZON_STATS), ex.: precipitação total >= 50 mm; ela define o nível e os
+    motivos, mas não gera intervalos de risco.
+    """
+    name: str
+    field: str
+    operator: str
+    threshold: float
+    window: int = 1
+    aggregate: str = "value"
+    severity: str = "PERIGO"
+
+    def __post_init__(self):
+        if self.field not in HOURLY_FIELDS:
+            raise ValueError(f"Unknown field in risk rule {self.name!r}: {self.field}")
+        if self.operator not in OPERATORS:
+            raise ValueError(f"Unknown operator in risk rule {self.name!r}: {self.operator}")
+        if self.aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate in risk rule {self.name!r}: {self.aggregate}")
+        if self.severity not in SEVERITY_LEVELS[1:]:
+            raise ValueError(f"Unknown severity in risk rule {self.name!r}: {self.severity}")
+        if self.window == 0:
+            if (self.field, self.aggregate) not in HORIZON_STATS:
+                raise ValueError(f"Unknown horizon statistic in risk rule {self.name!r}: {self.aggregate} of {self.field}")
+        elif self.window < 1 or (self.window > 1 and self.aggregate == "value"):
+            raise ValueError(f"Invalid window in risk rule {self.name!r}: {self.window}")
+
+
+# Limites sobre o horizonte completo que definem o nível de risco e os motivos de cada cidade.
+DEFAULT_RULES = (
+    RiskRule("alta precipitação", "precipitation", ">=", 50, window=0, aggregate="sum"),
+    RiskRule("alta velocidade do vento", "windspeed_10m", ">=", 50, window=0, aggregate="max"),
+    RiskRule("temperatura máxima alta", "temperature_2m", ">=", 40, window=0, aggregate="max"),
+    RiskRule("temperatura mínima baixa", "temperature_2m", "<", -5, window=0, aggregate="min"),
+    RiskRule("baixa pressão atmosférica", "pressure_msl", "<=", 900, window=0, aggregate="mean"),
+    RiskRule("alta radiação solar direta", "direct_radiation", ">=", 500, window=0, aggregate="mean"),
+)
+
+# Regras horárias opcionais (RISK_HOURLY_RULES), que indicam quando o risco ocorre.
+HOURLY_RULES = (
+    RiskRule("chuva intensa em 3 h", "precipitation", ">=", 30, window=3, aggregate="sum"),
+    RiskRule("chuva acumulada em 24 h", "precipitation", ">=", 50, window=24, aggregate="sum"),
+    RiskRule("chuva moderada", "precipitation", ">=", 10, severity="ATENÇÃO"),
+    RiskRule("rajadas de vento", "windspeed_10m", ">=", 50),
+    RiskRule("ventania", "windspeed_10m", ">=", 35, severity="ATENÇÃO"),
+    RiskRule("calor extremo", "temperature_2m", ">=", 40),
+    RiskRule("frio extremo", "temperature_2m", "<", -5),
+)
+
+
+def load_rules(path: Optional[str] = RISK_RULES_PATH, hourly: bool = RISK_HOURLY_RULES) -> Tuple[RiskRule, ...]:
+    """
+    Lê as regras de um arquivo JSON (lista de objetos com os campos de RiskRule)
+    ou usa as padrão, acrescidas das horárias se `hourly`.
+    """
+    if not path:
+        return DEFAULT_RULES + HOURLY_RULES if hourly else DEFAULT_RULES
+    with open(path, encoding="utf-8") as rules_file:
+        return tuple(RiskRule(**rule) for rule in json.load(rules_file))
+
+
+def _rolling(matrix: np.ndarray, window: int, aggregate: str) -> np.ndarray:
+    """
+    Agrega cada hora com as `window - 1` anteriores (horas × cidades). Horas sem
+    valor dentro da janela são ignoradas; a hora sem valor próprio resulta em NaN.
+    """
+    if aggregate == "value" or matrix.shape[0] == 0:
+        return matrix
+    missing = np.isnan(matrix)
+    if aggregate in ("sum", "mean"):
+        # Soma direta de cada janela, arredondada bem abaixo da precisão da API
+        # (décimos): o erro de ponto flutuante faria uma janela exatamente no
+        # limite, como 1.9 + 0.8 + 3.3 >= 6, deixar de satisfazer `>=`.
+        zeros = np.zeros((window - 1, matrix.shape[1]))
+        present = np.vstack([zeros, np.where(missing, 0.0, matrix)])
+        window_sums = np.round(sliding_window_view(present, window, axis=0).sum(axis=-1), 6)
+        window_counts = sliding_window_view(np.vstack([zeros, (~missing).astype(float)]), window, axis=0).sum(axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = window_sums if aggregate == "sum" else window_sums / window_counts
+        return np.where(missing, np.nan, values)
+    padded = np.vstack([np.full((window - 1, matrix.shape[1]), np.nan), matrix])
+    ufunc = np.fmax if aggregate == "max" else np.fmin
+    return np.where(missing, np.nan, ufunc.reduce(sliding_window_view(padded, window, axis=0), axis=-1))
+
+
+class CompiledRules:
+    """
+    Regras pré-processadas para avaliação vetorizada: cada agregação
+    (campo, janela, função) é calculada uma única vez por avaliação e as
+    comparações são feitas com ufuncs do NumPy sobre todas as cidades.
+    """
+
+    def __init__(self, rules: Sequence[RiskRule]):
+        self.rules = tuple(rules)
+        self.horizon_rules = tuple(rule for rule in self.rules if rule.window == 0)
+        hourly_rules = [rule for rule in self.rules if rule.window > 0]
+        self.fields = tuple(sorted({rule.field for rule in hourly_rules}))
+        self.series = tuple(sorted({(rule.field, rule.window, rule.aggregate) for rule in hourly_rules}))
+        self._comparisons = [
+            (rule, self.series.index((rule.field, rule.window, rule.aggregate)), OPERATORS[rule.operator])
+            for rule in hourly_rules
+        ]
+
+    def evaluate(self, matrices: Dict[str, np.ndarray]) -> List[Tuple[RiskRule, np.ndarray, np.ndarray]]:
+        """Para cada regra, os valores agregados e a máscara booleana (horas × cidades) das horas em risco."""
+        aggregated = [_rolling(matrices[field], window, aggregate) for field, window, aggregate in self.series]
+        results = []
+        for rule, series_index, compare in self._comparisons:
+            values = aggregated[series_index]
+            with np.errstate(invalid="ignore"):
+                results.append((rule, values, compare(values, rule.threshold)))
+        return results
+
+
+def assess_statistics(statistics: Sequence[dict], compiled: Optional[CompiledRules] = None) -> List[Tuple[str, List[str]]]:
+    """
+    Nível de risco e motivos de cada cidade pelas regras do horizonte completo,
+    comparadas com as estatísticas já calculadas (uma comparação vetorizada por regra).
+    """
+    compiled = compiled or compiled_rules
+    reasons: List[List[str]] = [[] for _ in statistics]
+    levels: List[List[str]] = [[] for _ in statistics]
+    for rule in compiled.horizon_rules:
+        key = HORIZON_STATS[(rule.field, rule.aggregate)]
+        values = np.array([np.nan if stats.get(key) is None else stats[key] for stats in statistics], dtype=float)
+        with np.errstate(invalid="ignore"):
+            matches = OPERATORS[rule.operator](values, rule.threshold)
+        for index in np.flatnonzero(matches).tolist():
+            reasons[index].append(rule.name)
+            levels[index].append(rule.severity)
+    return [(highest_severity(city_levels), city_reasons) for city_levels, city_reasons in zip(levels, reasons)]
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Trechos contíguos de True em cada coluna: (colunas, hora inicial, hora final inclusiva)."""
+    edges = np.diff(np.vstack([
+        np.zeros((1, mask.shape[1]), dtype=np.int8),
+        mask.astype(np.int8),
+        np.zeros((1, mask.shape[1]), dtype=np.int8),
+    ]), axis=0)
+    # Ordena por coluna (transposta) para que inícios e fins fiquem pareados.
+    start_columns, start_hours = np.nonzero(edges.T == 1)
+    _, end_hours = np.nonzero(edges.T == -1)
+    return start_columns, start_hours, end_hours - 1
+
+
+def _peaks(values: np.ndarray, columns: np.ndarray, starts: np.ndarray, ends: np.ndarray, ufunc: np.ufunc) -> np.ndarray:
+    """Valor extremo de cada trecho, calculado com uma única chamada a `reduceat`."""
+    flat = np.append(values.T.ravel(), np.nan)
+    offsets = columns * values.shape[0]
+    bounds = np.empty(2 * len(columns), dtype=np.intp)
+    bounds[0::2] = offsets + starts
+    bounds[1::2] = offsets + ends + 1
+    return ufunc.reduceat(flat, bounds)[0::2]
+
+
+def _time(times: Optional[list], hour: int):
+    return times[hour] if times and hour < len(times) else None
+
+
+def find_risk_windows(weather_data_list: Sequence[dict], matrices: Optional[Dict[str, np.ndarray]] = None,
+                      compiled: Optional[CompiledRules] = None) -> List[List[dict]]:
+    """
+    Avalia as regras hora a hora para todas as cidades de uma vez e retorna, para
+    cada cidade, os intervalos contíguos em que cada regra é satisfeita. Em regras
+    com janela, o intervalo começa na primeira hora da janela acumulada.
+    `matrices` permite reaproveitar o resultado de `weather_stats.pack_hourly`.
+    """
+    compiled = compiled or compiled_rules
+    hourly = [weather_data.get("hourly") or {} for weather_data in weather_data_list]
+    if matrices is None:
+        matrices = pack_hourly(weather_data_list, compiled.fields)
+    windows: List[List[dict]] = [[] for _ in weather_data_list]
+    for rule, values, mask in compiled.evaluate(matrices):
+        if not mask.any():
+            continue
+        columns, starts, ends = _runs(mask)
+        worst = np.fmin if rule.operator in ("<", "<=") else np.fmax
+        peaks = np.round(_peaks(values, columns, starts, ends, worst), 2)
+        firsts = np.maximum(starts - rule.window + 1, 0)
+        runs: List[list] = []
+        for column, first, end, peak in zip(columns.tolist(), firsts.tolist(), ends.tolist(), peaks.tolist()):
+            if runs and runs[-1][0] == column and first <= runs[-1][2] + 1:
+                # Janelas acumuladas que se sobrepõem formam um único intervalo.
+                runs[-1][2] = end
+                runs[-1][3] = float(worst(runs[-1][3], peak))
+            else:
+                runs.append([column, first, end, peak])
+        for column, first, end, peak in runs:
+            times = hourly[column].get("time")
+            windows[column].append({
+                "rule": rule.name,
+                "severity": rule.severity,
+                "start": _time(times, first),
+                "end": _time(times, end),
+                "hours": end - first + 1,
+                "peak": peak,
+            })
+    for city_windows in windows:
+        city_windows.sort(key=lambda window: (window["start"] or "", window["rule"]))
+    return windows
+
+
+def highest_severity(levels: Sequence[str]) -> str:
+    """O nível mais grave entre os informados (SEGURO se vazio)."""
+    return max(levels, key=SEVERITY_LEVELS.index, default=SEVERITY_LEVELS[0])
+
+
+compiled_rules = CompiledRules(load_rules())
@@ -1,41 +1,246 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.services import get_statistics_for_all_cities
+from src import history, metrics, responses
+from src.database import get_db
+from src.query import NUMERIC_FIELDS
+from src.scheduler import Region
+from src.services import iter_statistics_for_all_cities
+from src.snapshot import RS_REGION, WeatherSnapshot, get_snapshot, sweep_scheduler
+from src.window_stats import WINDOW_NAMES, window_city
 
 router = APIRouter()
 
+# As rotas de cidades devolvem bytes já serializados (Response), então o
+# esquema e os tipos de mídia são declarados aqui, sem response_model.
+_CITY_LIST_SCHEMA = {"type": "array", "items": {"type": "object"}}
+_FILTER_RESPONSES = {
+    200: {"description": "Cities with their weather statistics", "content": {"application/json": {"schema": _CITY_LIST_SCHEMA}}},
+}
+_LOCATIONS_RESPONSES = {
+    200: {
+        "description": "Cities with their weather statistics, or one city per line/event when streaming",
+        "content": {
+            "application/json": {"schema": _CITY_LIST_SCHEMA},
+            "application/x-ndjson": {"schema": {"type": "string"}},
+            "text/event-stream": {"schema": {"type": "string"}},
+        },
+    },
+}
 
-@router.get("/locations/rs", response_model=List[dict])
-async def get_locations_rs() -> List[dict]:
+
+def _snapshot_headers(snapshot: WeatherSnapshot) -> Dict[str, str]:
+    """Informa ao cliente a versão e o horário de geração dos dados."""
+    return {
+        "X-Snapshot-Version": str(snapshot.version),
+        "X-Snapshot-Generated-At": snapshot.generated_at.isoformat(),
+    }
+
+
+def _parse_bounds(bounds: List[str]) -> Dict[str, float]:
+    """Converte limites no formato `campo:valor` em um dicionário."""
+    parsed = {}
+    for bound in bounds:
+        field, _, value = bound.partition(":")
+        if field not in NUMERIC_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Invalid field: {field}")
+        try:
+            parsed[field] = float(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid value for {field}: {value}")
+    return parsed
+
+
+def _stream_format(request: Request, stream: Optional[str]) -> Optional[str]:
+    """Escolhe o formato de streaming pelo parâmetro `stream` ou pelo cabeçalho Accept."""
+    if stream is not None:
+        return stream
+    accept = request.headers.get("accept", "")
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    return None
+
+
+def _get_region(region: str) -> Region:
+    """Região configurada em SWEEP_REGIONS, pela sigla (UF) ou pelo nome."""
+    configured = sweep_scheduler.get(region)
+    if configured is None:
+        raise HTTPException(status_code=404, detail=f"Unknown region: {region}")
+    return configured
+
+
+def _check_window(window: Optional[str]) -> None:
+    if window is not None and window not in WINDOW_NAMES:
+        raise HTTPException(status_code=400, detail=f"Invalid window: {window}")
+
+
+async def _window_cities(region: Region, window: Optional[str]) -> AsyncIterator[dict]:
+    async for city in iter_statistics_for_all_cities(region.admin_name):
+        yield city if window is None else window_city(city, window)
+
+
+async def _ndjson_lines(region: Region, window: Optional[str]) -> AsyncIterator[bytes]:
+    async for city in _window_cities(region, window):
+        yield responses.dumps(city) + b"\n"
+
+
+async def _sse_events(region: Region, window: Optional[str]) -> AsyncIterator[bytes]:
+    async for city in _window_cities(region, window):
+        yield b"event: city\ndata: " + responses.dumps(city) + b"\n\n"
+    yield b"event: end\ndata: {}\n\n"
+
+
+async def _get_snapshot(region: Region, window: Optional[str]) -> WeatherSnapshot:
+    with metrics.stage("snapshot", metrics.request_stage_duration):
+        snapshot = await get_snapshot(region)
+        return snapshot if window is None else snapshot.window_view(window)
+
+
+async def _locations_response(request: Request, stream: Optional[str], region: Region, window: Optional[str]) -> Response:
+    _check_window(window)
+    stream_format = _stream_format(request, stream)
+    if stream_format == "ndjson":
+        return StreamingResponse(_ndjson_lines(region, window), media_type="application/x-ndjson")
+    if stream_format == "sse":
+        return StreamingResponse(
+            _sse_events(region, window),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    snapshot = await _get_snapshot(region, window)
+    if not snapshot.cities:
+        raise HTTPException(status_code=404, detail="No cities found")
+    # Bytes serializados e comprimidos na publicação do snapshot, com ETag forte.
+    return responses.encoded_response(request, snapshot.body, _snapshot_headers(snapshot))
+
+
+async def _filter_response(request: Request, region: Region, window: Optional[str], sort_by: Optional[str], order: str,
+                           minimums: List[str], maximums: List[str], **criteria) -> Response:
+    if sort_by is not None and sort_by not in NUMERIC_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort field: {sort_by}")
+    _check_window(window)
+    snapshot = await _get_snapshot(region, window)
+    with metrics.stage("query", metrics.request_stage_duration):
+        positions = snapshot.index.query_positions(
+            minimums=_parse_bounds(minimums),
+            maximums=_parse_bounds(maximums),
+            sort_by=sort_by,
+            descending=order == "desc",
+            **criteria,
+        )
+
+    if not positions:
+        raise HTTPException(status_code=404, detail="No cities match the criteria")
+
+    # A ETag depende do conteúdo do snapshot e das cidades selecionadas, na ordem.
+    etag = responses.content_etag(snapshot.body.etag.encode(), ",".join(map(str, positions)).encode())
+    return responses.json_fragments_response(
+        request, [snapshot.fragments[position] for position in positions], etag, _snapshot_headers(snapshot)
+    )
+
+
+@router.get("/locations/rs", response_class=Response, responses=_LOCATIONS_RESPONSES)
+async def get_locations_rs(
+    request: Request,
+    stream: Optional[Literal["ndjson", "sse"]] = Query(None, description="Stream cities as they complete: ndjson or sse"),
+    window: Optional[str] = Query(None, description=f"Statistics for the next hours only: {', '.join(WINDOW_NAMES)}"),
+) -> Response:
     """
     Retorna todas as cidades do Rio Grande do Sul com suas estatísticas
-    meteorológicas.
+    meteorológicas. No modo streaming (NDJSON ou Server-Sent Events) cada
+    cidade é enviada assim que a sua previsão é obtida. Com `window` (ex.: 6h),
+    as estatísticas cobrem só as próximas horas.
     """
-    cities: List[dict] = await get_statistics_for_all_cities()
-    if not cities:
-        raise HTTPException(status_code=404, detail="No cities found")
-    return cities
+    return await _locations_response(request, stream, RS_REGION, window)
 
 
-@router.get("/locations/rs/filter", response_model=List[dict])
+@router.get("/locations/rs/filter", response_class=Response, responses=_FILTER_RESPONSES)
 async def filter_locations_rs(
-    status: Optional[str] = Query(None, description="Status to filter by: SEGURO and PERIGO"),
-    city: Optional[str] = Query(None, description="City to filter by (optional)")
+    request: Request,
+    status: Optional[str] = Query(None, description="Status to filter by: SEGURO, ATENÇÃO or PERIGO"),
+    city: Optional[str] = Query(None, description="City to filter by (optional)"),
+    minimums: List[str] = Query([], alias="min", description="Lower bound as field:value, e.g. precipitation_sum:30"),
+    maximums: List[str] = Query([], alias="max", description="Upper bound as field:value, e.g. wind_speed_max:60"),
+    sort_by: Optional[str] = Query(None, description=f"Field to sort by: {', '.join(NUMERIC_FIELDS)}"),
+    order: Literal["asc", "desc"] = Query("desc", description="Sort order"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of cities (top-N)"),
+    window: Optional[str] = Query(None, description=f"Statistics for the next hours only: {', '.join(WINDOW_NAMES)}"),
+) -> Response:
+    """
+    Filtra as cidades do Rio Grande do Sul por status de risco, nome da cidade e
+    intervalos das estatísticas, com ordenação e top-N, usando os índices do snapshot.
+    """
+    return await _filter_response(request, RS_REGION, window, sort_by, order, minimums, maximums,
+                                  status=status, city=city, limit=limit)
+
+
+@router.get("/locations/{region}/history/{city}", response_model=List[dict])
+async def get_city_history(
+    region: str,
+    city: str,
+    start: Optional[datetime] = Query(None, description="Start of the time range (UTC)"),
+    end: Optional[datetime] = Query(None, description="End of the time range (UTC)"),
+    hourly: bool = Query(False, description="Include the hourly series of each record"),
+    db: AsyncSession = Depends(get_db),
 ) -> List[dict]:
     """
-    Filtra as cidades do Rio Grande do Sul com base no status de risco e/ou nome da cidade.
-    """
-    cities: List[dict] = await get_statistics_for_all_cities()
-    
-    if status:
-        cities = [city_data for city_data in cities if city_data.get("stats", {}).get("risk_level") == status]
-    
-    if city:
-        cities = [city_data for city_data in cities if city_data.get("city").lower() == city.lower()]
-    
-    if not cities:
-        raise HTTPException(status_code=404, detail="No cities match the criteria")
-    
-    return cities
+    Retorna o histórico de estatísticas de uma cidade de uma região (sigla ou
+    nome do estado) no intervalo informado, sem consultar a API de previsão.
+    """
+    configured = _get_region(region)
+    with metrics.stage("history", metrics.request_stage_duration):
+        records = await history.get_city_history(db, configured.key, city, start, end, include_hourly=hourly)
+    if not records:
+        raise HTTPException(status_code=404, detail="No history found for this city")
+    return records
+
+
+@router.get("/locations/{region}/history/{city}/latest", response_model=dict)
+async def get_city_last_known_good(region: str, city: str, db: AsyncSession = Depends(get_db)) -> dict:
+    """
+    Retorna a última previsão gravada com sucesso para a cidade da região, útil
+    quando a API de previsão está indisponível.
+    """
+    record = await history.get_last_known_good(db, _get_region(region).key, city)
+    if record is None:
+        raise HTTPException(status_code=404, detail="No history found for this city")
+    return record
+
+
+@router.get("/locations/{region}", response_class=Response, responses=_LOCATIONS_RESPONSES)
+async def get_locations_in_region(
+    request: Request,
+    region: str,
+    stream: Optional[Literal["ndjson", "sse"]] = Query(None, description="Stream cities as they complete: ndjson or sse"),
+    window: Optional[str] = Query(None, description=f"Statistics for the next hours only: {', '.join(WINDOW_NAMES)}"),
+) -> Response:
+    """
+    Retorna as cidades de uma região configurada (sigla ou nome do estado) com
+    suas estatísticas meteorológicas, a partir do snapshot mais recente da região.
+    """
+    return await _locations_response(request, stream, _get_region(region), window)
+
+
+@router.get("/locations/{region}/filter", response_class=Response, responses=_FILTER_RESPONSES)
+async def filter_locations_in_region(
+    request: Request,
+    region: str,
+    status: Optional[str] = Query(None, description="Status to filter by: SEGURO, ATENÇÃO or PERIGO"),
+    city: Optional[str] = Query(None, description="City to filter by (optional)"),
+    minimums: List[str] = Query([], alias="min", description="Lower bound as field:value, e.g. precipitation_sum:30"),
+    maximums: List[str] = Query([], alias="max", description="Upper bound as field:value, e.g. wind_speed_max:60"),
+    sort_by: Optional[str] = Query(None, description=f"Field to sort by: {', '.join(NUMERIC_FIELDS)}"),
+    order: Literal["asc", "desc"] = Query("desc", description="Sort order"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of cities (top-N)"),
+    window: Optional[str] = Query(None, description=f"Statistics for the next hours only: {', '.join(WINDOW_NAMES)}"),
+) -> Response:
+    """Filtra as cidades de uma região como em /locations/rs/filter."""
+    return await _filter_response(request, _get_region(region), window, sort_by, order, minimums, maximums,
+                                  status=status, city=city, limit=limit)
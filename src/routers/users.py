@@ -1,28 +1,31 @@
 from datetime import timedelta
-from typing import List
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import NoResultFound
 
-from src import models, schemas, services, utils
-from src.database import SessionLocal, engine
-
-models.Base.metadata.create_all(bind=engine)
+from src import models, schemas, services, uploads, utils
+from src.database import get_db
+from src.snapshot import get_snapshot, region_snapshots
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _server_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, try again later",
+        headers={"Retry-After": "1"},
+    )
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    cached_user = services.principal_cache.get(token)
+    if cached_user is not None:
+        return cached_user
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -35,19 +38,26 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = await services.get_user_by_username(db, username)
     if user is None:
         raise credentials_exception
+    services.principal_cache.set(token, user, payload.get("exp"))
     return user
 
 @router.post("/register/", response_model=schemas.User)
-async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = services.create_user(db, user)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    try:
+        db_user = await services.create_user(db, user)
+    except services.ServerBusyError:
+        raise _server_busy()
     return db_user
 
 @router.post("/token", response_model=schemas.Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = services.authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    try:
+        user = await services.authenticate_user(db, form_data.username, form_data.password)
+    except services.ServerBusyError:
+        raise _server_busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,16 +74,21 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 async def upload_identity_photo(
     token: str = Depends(oauth2_scheme),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    user = get_current_user(token, db)
-    file_location = f"identity_photos/{user.id}_{file.filename}"
-    with open(file_location, "wb+") as file_object:
-        file_object.write(file.file.read())
+    current_user = await get_current_user(token, db)
+    user = await db.get(models.User, current_user.id)
+    try:
+        file_location = await uploads.store_upload(file)
+    except uploads.UploadTooLargeError:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+    except uploads.UnsupportedUploadTypeError:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type")
 
     user.identity_photo = file_location
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    services.principal_cache.invalidate_user(user.id)
 
     return {"info": "Identity photo uploaded successfully"}
 
@@ -81,21 +96,21 @@ async def upload_identity_photo(
 async def create_donation_location(
     location: schemas.DonationLocationCreate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not current_user.is_collector:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Operation not permitted")
-    db_location = services.create_donation_location(db, location, current_user.id)
+    db_location = await services.create_donation_location(db, location, current_user.id)
     return db_location
 
 @router.delete("/donation-location/{location_id}", response_model=schemas.DonationLocationDeleteResponse)
 async def delete_donation_location(
     location_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
-        response = services.delete_donation_location(db, location_id, current_user)
+        response = await services.delete_donation_location(db, location_id, current_user)
     except NoResultFound:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Location not found")
     except PermissionError:
@@ -108,10 +123,10 @@ async def update_donation_location(
     location_id: int,
     location_update: schemas.DonationLocationUpdate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
-        db_location = services.update_donation_location(db, location_id, location_update, current_user)
+        db_location = await services.update_donation_location(db, location_id, location_update, current_user)
     except NoResultFound:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Location not found")
     except PermissionError:
@@ -119,11 +134,100 @@ async def update_donation_location(
     return db_location
 
 
+class DonationLocationFilters:
+    """Filtros e paginação por cursor comuns às listagens de pontos de coleta."""
+
+    def __init__(
+        self,
+        after: Optional[int] = Query(None, description="Cursor: id of the last item of the previous page"),
+        limit: int = Query(services.DONATION_PAGE_SIZE, ge=1, le=500),
+        hygiene: Optional[bool] = None,
+        food: Optional[bool] = None,
+        clothes: Optional[bool] = None,
+        q: Optional[str] = Query(None, description="Full-text search over name and location"),
+    ):
+        self.after = after
+        self.limit = limit
+        self.hygiene = hygiene
+        self.food = food
+        self.clothes = clothes
+        self.q = q
+
+    def page(self, response: Response, locations: list) -> list:
+        """Informa o cursor da próxima página no cabeçalho X-Next-Cursor."""
+        if len(locations) == self.limit:
+            response.headers["X-Next-Cursor"] = str(locations[-1].id)
+        return locations
+
+
 @router.get("/donation-locations/", response_model=List[schemas.DonationLocation])
-async def list_donation_locations(db: Session = Depends(get_db)):
-    return services.list_donation_locations(db)
+async def list_donation_locations(response: Response, filters: DonationLocationFilters = Depends(), db: AsyncSession = Depends(get_db)):
+    return filters.page(response, await services.list_donation_locations(db, **vars(filters)))
 
 
 @router.get("/donation-locations/state/{state}", response_model=List[schemas.DonationLocation])
-async def list_donation_locations_by_state(state: str, db: Session = Depends(get_db)):
-    return services.list_donation_locations_by_state(db, state)
+async def list_donation_locations_by_state(state: str, response: Response, filters: DonationLocationFilters = Depends(), db: AsyncSession = Depends(get_db)):
+    return filters.page(response, await services.list_donation_locations_by_state(db, state, **vars(filters)))
+
+
+def _resolve_point(lat: Optional[float], lon: Optional[float], city: Optional[str]) -> Tuple[float, float]:
+    """Obtém o ponto de referência das coordenadas informadas ou do nome da cidade."""
+    if lat is not None and lon is not None:
+        return lat, lon
+    if city:
+        lat, lon = services.geocode_donation_location(city)
+        if lat is not None:
+            return lat, lon
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="City not found")
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide lat and lon or city")
+
+
+def _with_distance(matches, city: Optional[str] = None) -> List[dict]:
+    return [
+        dict(
+            {column.name: getattr(location, column.name) for column in models.DonationLocation.__table__.columns},
+            distance_km=round(distance, 3),
+            city=city,
+        )
+        for location, distance in matches
+    ]
+
+
+@router.get("/donation-locations/nearest", response_model=List[schemas.DonationLocationNearby])
+async def list_nearest_donation_locations(
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    city: Optional[str] = None,
+    k: int = Query(20, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    lat, lon = _resolve_point(lat, lon, city)
+    return _with_distance(await services.find_nearest_donation_locations(db, lat, lon, k))
+
+
+@router.get("/donation-locations/nearby", response_model=List[schemas.DonationLocationNearby])
+async def list_donation_locations_nearby(
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    city: Optional[str] = None,
+    radius_km: float = Query(10, gt=0, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    lat, lon = _resolve_point(lat, lon, city)
+    return _with_distance(await services.find_donation_locations_within(db, lat, lon, radius_km))
+
+
+@router.get("/donation-locations/at-risk", response_model=List[schemas.DonationLocationNearby])
+async def list_donation_locations_at_risk(
+    radius_km: float = Query(15, gt=0, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    snapshots = [store.current for store in region_snapshots.values() if store.current is not None] or [await get_snapshot()]
+    at_risk = [
+        city for snapshot in snapshots for city in snapshot.cities
+        if city.get("stats", {}).get("risk_level") == "PERIGO"
+    ]
+    results = []
+    for city, matches in await services.find_donation_locations_in_cities(db, at_risk, radius_km):
+        results.extend(_with_distance(matches, city=city["city"]))
+    return results
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from src.gazetteer import BRAZIL_STATES, Gazetteer, state_key
+from src.risk_rules import SEVERITY_LEVELS
+
+logger = logging.getLogger(__name__)
+
+# Estados (siglas ou nomes) ou quaisquer `admin_name` do worldcities.csv, separados por vírgula.
+SWEEP_REGIONS = [region.strip() for region in os.getenv("SWEEP_REGIONS", "RS").split(",") if region.strip()]
+SWEEP_ATTENTION_INTERVAL = float(os.getenv("SWEEP_ATTENTION_INTERVAL", "600"))
+SWEEP_HIGH_RISK_INTERVAL = float(os.getenv("SWEEP_HIGH_RISK_INTERVAL", "300"))
+SWEEP_RETRY_INTERVAL = float(os.getenv("SWEEP_RETRY_INTERVAL", "60"))
+SWEEP_MAX_PARALLEL_REGIONS = max(1, int(os.getenv("SWEEP_MAX_PARALLEL_REGIONS", "2")))
+SWEEP_IDLE_POLL = 5.0
+
+
+@dataclass
+class Region:
+    """Uma região (estado) varrida como uma unidade, com o seu próprio snapshot."""
+    key: str  # nome normalizado, usado nas rotas e nos arquivos compartilhados
+    admin_name: str
+    population: float = 0.0
+    severity: str = SEVERITY_LEVELS[0]
+    next_due: float = 0.0  # instante (time.time()) da próxima varredura
+    refreshing: bool = False
+
+
+def region_from_name(name: str) -> Region:
+    """Região a partir da sigla (UF) ou do nome do estado."""
+    name = name.strip()
+    return Region(state_key(name), BRAZIL_STATES.get(name.upper(), name))
+
+
+class SweepScheduler:
+    """
+    Decide quais regiões varrer e quando. Cada região é atualizada no intervalo
+    do seu nível de risco (as de risco mais alto com mais frequência); entre as
+    regiões vencidas, são atendidas primeiro as de maior risco e, depois, as mais
+    populosas. No máximo `max_parallel` regiões são varridas ao mesmo tempo, o
+    que limita a memória e as conexões usadas pela varredura.
+    """
+
+    def __init__(self, regions: Sequence[Region], intervals: Dict[str, float],
+                 max_parallel: int = SWEEP_MAX_PARALLEL_REGIONS, retry_interval: float = SWEEP_RETRY_INTERVAL):
+        self.regions: Dict[str, Region] = {region.key: region for region in regions}
+        self.intervals = intervals
+        self.max_parallel = max_parallel
+        self.retry_interval = retry_interval
+
+    def get(self, name: str) -> Optional[Region]:
+        """Região configurada com a sigla ou o nome informado."""
+        return self.regions.get(state_key(name))
+
+    def load_populations(self, gazetteer: Gazetteer) -> None:
+        for region in self.regions.values():
+            region.population = gazetteer.population_in(region.admin_name)
+
+    def interval_for(self, severity: str) -> float:
+        return self.intervals.get(severity, self.intervals[SEVERITY_LEVELS[0]])
+
+    def mark_refreshed(self, region: Region, severity: str, refreshed_at: float) -> None:
+        region.severity = severity
+        region.next_due = refreshed_at + self.interval_for(severity)
+
+    def mark_failed(self, region: Region) -> None:
+        region.next_due = time.time() + self.retry_interval
+
+    def due(self, now: Optional[float] = None) -> List[Region]:
+        """Regiões vencidas e livres, da mais prioritária para a menos prioritária."""
+        now = time.time() if now is None else now
+        due = [region for region in self.regions.values() if region.next_due <= now and not region.refreshing]
+        return sorted(due, key=lambda region: (-SEVERITY_LEVELS.index(region.severity), -region.population))
+
+    def _seconds_until_next(self) -> float:
+        pending = [region.next_due for region in self.regions.values() if not region.refreshing]
+        if not pending:
+            return SWEEP_IDLE_POLL
+        return min(SWEEP_IDLE_POLL, max(0.1, min(pending) - time.time()))
+
+    async def _worker(self, refresh: Callable[[Region], Awaitable[object]], is_active: Callable[[], bool]) -> None:
+        while True:
+            due = self.due() if is_active() else []
+            if not due:
+                await asyncio.sleep(self._seconds_until_next())
+                continue
+            region = due[0]
+            region.refreshing = True
+            try:
+                await refresh(region)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falha ao atualizar a região %s", region.admin_name)
+                self.mark_failed(region)
+            finally:
+                region.refreshing = False
+
+    async def run(self, refresh: Callable[[Region], Awaitable[object]],
+                  is_active: Callable[[], bool] = lambda: True) -> None:
+        """
+        Varre as regiões vencidas com `refresh` até ser cancelado. `refresh` deve
+        chamar `mark_refreshed`; enquanto `is_active()` for falso nada é varrido.
+        """
+        workers = [asyncio.create_task(self._worker(refresh, is_active)) for _ in range(self.max_parallel)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
@@ -34,6 +34,8 @@ class DonationLocationCreate(BaseModel):
     hygiene: Optional[bool] = False
     food: Optional[bool] = False
     clothes: Optional[bool] = False
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class DonationLocationUpdate(BaseModel):
     name: Optional[str] = None
@@ -41,6 +43,8 @@ class DonationLocationUpdate(BaseModel):
     hygiene: Optional[bool] = None
     food: Optional[bool] = None
     clothes: Optional[bool] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class DonationLocation(BaseModel):
     id: int
@@ -49,10 +53,16 @@ class DonationLocation(BaseModel):
     hygiene: bool
     food: bool
     clothes: bool
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     collector_id: int
 
     class Config:
         orm_mode = True
 
+class DonationLocationNearby(DonationLocation):
+    distance_km: float
+    city: Optional[str] = None
+
 class DonationLocationDeleteResponse(BaseModel):
     detail: str
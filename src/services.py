@@ -1,16 +1,49 @@
 import asyncio
-from typing import List, Optional, Tuple
+import functools
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 
-import aiohttp
-import pandas as pd
-from dotenv import load_dotenv
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import NoResultFound
 
-from src import models, schemas
+from src import metrics, models, schemas
+from src.gazetteer import find_state_key, get_gazetteer, normalize_name, state_key
+from src.http_client import http_client
+from src.query import CityIndex
+from src.risk_rules import assess_statistics, find_risk_windows, highest_severity
+from src.spatial import GridIndex, donation_index
+from src.weather_stats import calculate_statistics_batch, pack_hourly
+from src.window_stats import window_stats
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", "3600"))
+FORECAST_CACHE_STALE_TTL = float(os.getenv("FORECAST_CACHE_STALE_TTL", "1800"))
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "2048"))
+DONATION_PAGE_SIZE = int(os.getenv("DONATION_PAGE_SIZE", "50"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+WEATHER_BATCH_SIZE = max(1, int(os.getenv("WEATHER_BATCH_SIZE", "50")))
+# Resolução, em graus, da grade do modelo de previsão (0 desativa o agrupamento por célula).
+FORECAST_GRID_RESOLUTION = float(os.getenv("FORECAST_GRID_RESOLUTION", "0.1"))
+
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+FORECAST_QUERY = "hourly=temperature_2m,precipitation,windspeed_10m,precipitation_probability,pressure_msl,direct_radiation&daily=temperature_2m_max,temperature_2m_min,precipitation_sum&timezone=America/Sao_Paulo"
+
+RS_ADMIN_NAME = "Rio Grande do Sul"
+
+CacheKey = Tuple[float, float]
+
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -20,8 +53,100 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_user(db: Session, user: schemas.UserCreate) -> models.User:
-    hashed_password = get_password_hash(user.password)
+class ServerBusyError(Exception):
+    """Há trabalho demais na fila; o cliente deve tentar novamente mais tarde."""
+
+
+class PasswordHasher:
+    """
+    Executa o bcrypt num pool de threads limitado (o bcrypt libera o GIL),
+    fora do event loop. Acima de `max_pending` operações em andamento ou na
+    fila, novas chamadas falham com ServerBusyError em vez de se acumularem.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._max_pending = max_pending
+        self._pending = 0
+
+    async def _run(self, func: Callable, *args):
+        if self._pending >= self._max_pending:
+            raise ServerBusyError("Password hashing queue is full")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+
+class PrincipalCache:
+    """
+    Cache de curta duração do usuário autenticado por token, evitando decodificar
+    o JWT e consultar a tabela `users` a cada requisição. As entradas expiram
+    em `ttl` segundos (ou antes, junto com o token) e podem ser invalidadas
+    quando o usuário é alterado.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, models.User]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, set] = {}
+
+    def get(self, token: str) -> Optional[models.User]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if time.time() >= expires_at:
+            self._discard(token)
+            return None
+        self._entries.move_to_end(token)
+        return user
+
+    def set(self, token: str, user: models.User, token_expires_at: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        self._discard(token)
+        self._entries[token] = (expires_at, user)
+        self._tokens_by_user.setdefault(user.id, set()).add(token)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        for token in list(self._tokens_by_user.get(user_id, ())):
+            self._discard(token)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tokens_by_user.clear()
+
+    def _discard(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[1].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[1].id]
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_MAX_ENTRIES)
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
+    hashed_password = await password_hasher.hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -30,21 +155,84 @@ def create_user(db: Session, user: schemas.UserCreate) -> models.User:
         is_admin=user.is_admin
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
-    user = db.query(models.User).filter(models.User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[models.User]:
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    return result.scalars().first()
+
+
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[models.User]:
+    user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return None
     return user
 
 
-def create_donation_location(db: Session, location: schemas.DonationLocationCreate, collector_id: int) -> models.DonationLocation:
+def geocode_donation_location(location: str) -> Tuple[Optional[float], Optional[float]]:
+    """Obtém as coordenadas da cidade citada no endereço de um ponto de coleta."""
+    gazetteer = get_gazetteer()
+    row = gazetteer.geocode(location)
+    if row is None:
+        return None, None
+    return float(gazetteer.lat[row]), float(gazetteer.lng[row])
+
+
+def _location_fields(location: str) -> dict:
+    """
+    Coordenadas, cidade e estado (normalizados) obtidos do endereço de um ponto
+    de coleta. Estado desconhecido é gravado como "" para não ser reprocessado.
+    """
+    gazetteer = get_gazetteer()
+    # O estado escrito no endereço prevalece; o da cidade encontrada só é usado na falta dele.
+    explicit_state = find_state_key(location)
+    row = gazetteer.geocode(location)
+    if row is None:
+        return {"latitude": None, "longitude": None, "city_key": None, "state_key": explicit_state or ""}
+    return {
+        "latitude": float(gazetteer.lat[row]),
+        "longitude": float(gazetteer.lng[row]),
+        "city_key": normalize_name(str(gazetteer.city[row])),
+        "state_key": explicit_state or str(gazetteer.admin_keys[row]),
+    }
+
+
+def _apply_location_fields(db_location: models.DonationLocation, latitude: Optional[float] = None, longitude: Optional[float] = None) -> None:
+    for field, value in _location_fields(db_location.location).items():
+        setattr(db_location, field, value)
+    if latitude is not None and longitude is not None:
+        db_location.latitude, db_location.longitude = latitude, longitude
+
+
+async def _donation_version(db: AsyncSession) -> int:
+    """Contador de alterações dos pontos de coleta, mantido por triggers no banco."""
+    result = await db.execute(text("SELECT version FROM donation_locations_version WHERE id = 1"))
+    return result.scalar() or 0
+
+
+async def _index_donation_location(db: AsyncSession, location_id: int, latitude: Optional[float] = None,
+                                   longitude: Optional[float] = None) -> None:
+    """
+    Aplica ao índice espacial a alteração que este processo acabou de gravar.
+    Se outro processo também alterou os pontos, o índice é recarregado na próxima consulta.
+    """
+    if not donation_index.loaded:
+        return
+    if latitude is None or longitude is None:
+        donation_index.remove(location_id)
+    else:
+        donation_index.insert(location_id, latitude, longitude)
+    version = await _donation_version(db)
+    if donation_index.version is not None and version == donation_index.version + 1:
+        donation_index.version = version
+
+
+async def create_donation_location(db: AsyncSession, location: schemas.DonationLocationCreate, collector_id: int) -> models.DonationLocation:
     db_location = models.DonationLocation(
         name=location.name,
         location=location.location,
@@ -53,14 +241,16 @@ def create_donation_location(db: Session, location: schemas.DonationLocationCrea
         clothes=location.clothes,
         collector_id=collector_id
     )
+    _apply_location_fields(db_location, location.latitude, location.longitude)
     db.add(db_location)
-    db.commit()
-    db.refresh(db_location)
+    await db.commit()
+    await db.refresh(db_location)
+    await _index_donation_location(db, db_location.id, db_location.latitude, db_location.longitude)
     return db_location
 
 
-def update_donation_location(db: Session, location_id: int, location_update: schemas.DonationLocationUpdate, user: models.User):
-    location = db.query(models.DonationLocation).filter(models.DonationLocation.id == location_id).first()
+async def update_donation_location(db: AsyncSession, location_id: int, location_update: schemas.DonationLocationUpdate, user: models.User):
+    location = await db.get(models.DonationLocation, location_id)
     if location is None:
         raise NoResultFound("Location not found")
     if location.collector_id != user.id:
@@ -70,194 +260,473 @@ def update_donation_location(db: Session, location_id: int, location_update: sch
         location.name = location_update.name
     if location_update.location is not None:
         location.location = location_update.location
+        _apply_location_fields(location)
     if location_update.hygiene is not None:
         location.hygiene = location_update.hygiene
     if location_update.food is not None:
         location.food = location_update.food
     if location_update.clothes is not None:
         location.clothes = location_update.clothes
+    if location_update.latitude is not None and location_update.longitude is not None:
+        location.latitude = location_update.latitude
+        location.longitude = location_update.longitude
 
-    db.commit()
-    db.refresh(location)
+    await db.commit()
+    await db.refresh(location)
+    await _index_donation_location(db, location.id, location.latitude, location.longitude)
     return location
 
 
-def delete_donation_location(db: Session, location_id: int, user: models.User):
-    location = db.query(models.DonationLocation).filter(models.DonationLocation.id == location_id).first()
+async def delete_donation_location(db: AsyncSession, location_id: int, user: models.User):
+    location = await db.get(models.DonationLocation, location_id)
     if location is None:
         raise NoResultFound("Location not found")
     if location.collector_id != user.id and not user.is_admin:
         raise PermissionError("Not authorized to delete this location")
 
-    db.delete(location)
-    db.commit()
+    await db.delete(location)
+    await db.commit()
+    await _index_donation_location(db, location_id)
     return {"detail": "Location deleted"}
 
 
-def list_donation_locations(db: Session):
-    return db.query(models.DonationLocation).all()
-
-
-def list_donation_locations_by_state(db: Session, state: str):
-    return db.query(models.DonationLocation).filter(models.DonationLocation.location.ilike(f"%{state}%")).all()
-
-
-def load_cities_csv() -> pd.DataFrame:
-    """Carrega o arquivo CSV contendo os dados das cidades do Rio Grande do Sul."""
-    df: pd.DataFrame = pd.read_csv('data/worldcities.csv')
-    return df[df['admin_name'] == 'Rio Grande do Sul']
+def _fulltext_query(text_query: str) -> str:
+    """Converte o texto de busca em termos FTS5 com prefixo, escapando aspas."""
+    terms = [term.replace('"', '""') for term in text_query.split()]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+async def list_donation_locations(
+    db: AsyncSession,
+    after: Optional[int] = None,
+    limit: int = DONATION_PAGE_SIZE,
+    hygiene: Optional[bool] = None,
+    food: Optional[bool] = None,
+    clothes: Optional[bool] = None,
+    q: Optional[str] = None,
+    state: Optional[str] = None,
+):
+    """
+    Lista os pontos de coleta em páginas ordenadas por id (paginação por
+    cursor: `after` é o último id da página anterior).
+    """
+    query = select(models.DonationLocation)
+    if state is not None:
+        query = query.where(models.DonationLocation.state_key == state_key(state))
+    for column, value in (
+        (models.DonationLocation.hygiene, hygiene),
+        (models.DonationLocation.food, food),
+        (models.DonationLocation.clothes, clothes),
+    ):
+        if value is not None:
+            query = query.where(column == value)
+    if q and q.strip():
+        query = query.where(text(
+            "donation_locations.id IN (SELECT rowid FROM donation_locations_fts WHERE donation_locations_fts MATCH :q)"
+        ).bindparams(q=_fulltext_query(q)))
+    if after is not None:
+        query = query.where(models.DonationLocation.id > after)
+    result = await db.execute(query.order_by(models.DonationLocation.id).limit(limit))
+    return result.scalars().all()
+
+
+async def list_donation_locations_by_state(db: AsyncSession, state: str, **filters):
+    return await list_donation_locations(db, state=state, **filters)
+
+
+async def backfill_donation_locations(db: AsyncSession) -> int:
+    """Geocodifica os pontos de coleta gravados antes das colunas de coordenadas, cidade e estado."""
+    result = await db.execute(
+        select(models.DonationLocation)
+        .where(models.DonationLocation.state_key.is_(None), models.DonationLocation.location.isnot(None))
+    )
+    pending = result.scalars().all()
+    for location in pending:
+        latitude, longitude = location.latitude, location.longitude
+        _apply_location_fields(location, latitude, longitude)
+    if pending:
+        await db.commit()
+    return len(pending)
+
+
+async def load_donation_index(db: AsyncSession) -> GridIndex:
+    """
+    Carrega os pontos de coleta no índice espacial, geocodificando os que ainda
+    não têm coordenadas. O índice é de cada processo: ele é recarregado quando
+    o contador de alterações do banco mostra que outro worker mudou os pontos.
+    """
+    if not donation_index.loaded:
+        await backfill_donation_locations(db)
+    version = await _donation_version(db)
+    if donation_index.loaded and donation_index.version == version:
+        return donation_index
+    result = await db.execute(
+        select(models.DonationLocation.id, models.DonationLocation.latitude, models.DonationLocation.longitude)
+        .where(models.DonationLocation.latitude.isnot(None))
+    )
+    # Troca o conteúdo sem pausas no event loop, para nenhuma consulta ver o índice pela metade.
+    donation_index.clear()
+    for location_id, latitude, longitude in result:
+        donation_index.insert(location_id, latitude, longitude)
+    donation_index.loaded = True
+    donation_index.version = version
+    return donation_index
+
+
+async def _locations_with_distance(db: AsyncSession, matches: List[Tuple[int, float]]) -> List[Tuple[models.DonationLocation, float]]:
+    if not matches:
+        return []
+    ids = [location_id for location_id, _ in matches]
+    result = await db.execute(select(models.DonationLocation).where(models.DonationLocation.id.in_(ids)))
+    locations = {location.id: location for location in result.scalars()}
+    return [(locations[location_id], distance) for location_id, distance in matches if location_id in locations]
+
+
+async def find_nearest_donation_locations(db: AsyncSession, lat: float, lon: float, k: int) -> List[Tuple[models.DonationLocation, float]]:
+    """Os `k` pontos de coleta mais próximos do ponto, com a distância em km."""
+    index = await load_donation_index(db)
+    return await _locations_with_distance(db, index.nearest(lat, lon, k))
+
+
+async def find_donation_locations_within(db: AsyncSession, lat: float, lon: float, radius_km: float) -> List[Tuple[models.DonationLocation, float]]:
+    """Pontos de coleta a até `radius_km` do ponto, com a distância em km."""
+    index = await load_donation_index(db)
+    return await _locations_with_distance(db, index.within(lat, lon, radius_km))
+
+
+async def find_donation_locations_in_cities(db: AsyncSession, cities: List[dict], radius_km: float) -> List[Tuple[dict, List[Tuple[models.DonationLocation, float]]]]:
+    """Para cada cidade, os pontos de coleta a até `radius_km` das suas coordenadas."""
+    index = await load_donation_index(db)
+    matches_by_city = [(city, index.within(city["lat"], city["lon"], radius_km)) for city in cities]
+    matches_by_city = [(city, matches) for city, matches in matches_by_city if matches]
+    # Uma única consulta para todos os pontos encontrados
+    all_matches = [match for _, matches in matches_by_city for match in matches]
+    locations = {location.id: location for location, _ in await _locations_with_distance(db, all_matches)}
+    return [
+        (city, [(locations[location_id], distance) for location_id, distance in matches if location_id in locations])
+        for city, matches in matches_by_city
+    ]
+
+
+def get_city_coordinates(city_name: str, admin_name: str = RS_ADMIN_NAME) -> Tuple[Optional[float], Optional[float]]:
+    """Obtém as coordenadas (latitude e longitude) de uma cidade pelo nome."""
+    return get_gazetteer().coordinates(city_name, admin_name)
 
 
-def get_city_coordinates(city_name: str) -> Tuple[Optional[float], Optional[float]]:
-    """Obtém as coordenadas (latitude e longitude) de uma cidade pelo nome."""
-    df: pd.DataFrame = load_cities_csv()
-    city_row: pd.Series = df[df['city'].str.lower() == city_name.lower()]
-    if not city_row.empty:
-        return city_row.iloc[0]['lat'], city_row.iloc[0]['lng']
-    return None, None
+def get_cities_in_region(admin_name: str) -> List[dict]:
+    """Obtém uma lista de dicionários contendo os nomes e coordenadas das cidades de um estado."""
+    return get_gazetteer().cities_in(admin_name)
 
 
 def get_cities_rio_grande_do_sul() -> List[dict]:
     """Obtém uma lista de dicionários contendo os nomes e coordenadas das cidades do Rio Grande do Sul."""
-    df: pd.DataFrame = load_cities_csv()
-    return [{"city": row['city'], "lat": row['lat'], "lon": row['lng']} for _, row in df.iterrows()]
-
-
-async def fetch_weather_data(session: aiohttp.ClientSession, lat: float, lon: float) -> Optional[dict]:
-    """Busca dados meteorológicos de uma API com base na latitude e longitude."""
-    load_dotenv()
-    url: str = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=temperature_2m,precipitation,windspeed_10m,precipitation_probability,pressure_msl,direct_radiation&daily=temperature_2m_max,temperature_2m_min,precipitation_sum&timezone=America/Sao_Paulo"
-    async with session.get(url) as response:
-        if response.status == 200:
-            data: dict = await response.json()
-            return data
-    return None
+    return get_cities_in_region(RS_ADMIN_NAME)
+
+
+class ForecastCache:
+    """
+    Cache em memória das previsões, indexado pelas coordenadas.
+
+    Entradas com idade até `ttl` são servidas diretamente; até `ttl + stale_ttl`
+    são servidas enquanto uma revalidação roda em segundo plano. Buscas
+    simultâneas para a mesma chave compartilham uma única requisição.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, dict]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+
+    @staticmethod
+    def key(lat: float, lon: float) -> CacheKey:
+        return round(float(lat), 4), round(float(lon), 4)
+
+    def lookup(self, key: CacheKey, max_age: Optional[float] = None) -> Tuple[Optional[dict], bool]:
+        """
+        Retorna o valor em cache (ou None) e se ele ainda está fresco. Com
+        `max_age`, valores mais antigos que isso são tratados como ausentes.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        stored_at, value = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl + self.stale_ttl:
+            del self._entries[key]
+            return None, False
+        if max_age is not None and age > max_age:
+            return None, False
+        self._entries.move_to_end(key)
+        return value, age <= self.ttl
+
+    def set(self, key: CacheKey, value: dict) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _load(self, key: CacheKey, loader: Callable[[], Awaitable[Optional[dict]]]) -> asyncio.Future:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run_loader(key, loader))
+            self._inflight[key] = future
+        return future
+
+    async def _run_loader(self, key: CacheKey, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        try:
+            value = await loader()
+            if value is not None:
+                self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _load_many(self, keys: List[CacheKey], loader_many: Callable[[List[CacheKey]], Awaitable[List[Optional[dict]]]]) -> Dict[CacheKey, asyncio.Future]:
+        batch = asyncio.ensure_future(loader_many(keys))
+        futures = {}
+        for index, key in enumerate(keys):
+            future = asyncio.ensure_future(self._run_loader(key, functools.partial(_batch_item, batch, index)))
+            self._inflight[key] = future
+            futures[key] = future
+        return futures
+
+    async def get(self, key: CacheKey, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """Obtém o valor da chave, buscando-o com `loader` quando necessário."""
+        value, fresh = self.lookup(key)
+        if value is not None:
+            if not fresh:
+                self._load(key, loader).add_done_callback(_log_revalidation_failure)
+            return value
+        return await asyncio.shield(self._load(key, loader))
+
+    async def get_many(self, keys: List[CacheKey], loader_many: Callable[[List[CacheKey]], Awaitable[List[Optional[dict]]]],
+                       max_age: Optional[float] = None) -> List[Optional[dict]]:
+        """
+        Obtém os valores de várias chaves. As chaves ausentes (ou mais antigas
+        que `max_age`) são buscadas juntas com uma única chamada a `loader_many`;
+        as vencidas são revalidadas em lote em segundo plano. Chaves cuja busca
+        falha resultam em None.
+        """
+        results: Dict[CacheKey, Optional[dict]] = {}
+        stale: List[CacheKey] = []
+        waiting: Dict[CacheKey, asyncio.Future] = {}
+        missing: List[CacheKey] = []
+        for key in dict.fromkeys(keys):
+            value, fresh = self.lookup(key, max_age)
+            if value is not None:
+                results[key] = value
+                if not fresh and key not in self._inflight:
+                    stale.append(key)
+            elif key in self._inflight:
+                waiting[key] = self._inflight[key]
+            else:
+                missing.append(key)
+
+        if stale:
+            for future in self._load_many(stale, loader_many).values():
+                future.add_done_callback(_log_revalidation_failure)
+        if missing:
+            waiting.update(self._load_many(missing, loader_many))
+        if waiting:
+            values = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()), return_exceptions=True)
+            for key, value in zip(waiting, values):
+                if isinstance(value, BaseException):
+                    logger.warning("Falha ao buscar previsão para %s: %r", key, value)
+                    value = None
+                results[key] = value
+        return [results.get(key) for key in keys]
+
+
+async def _batch_item(batch: asyncio.Future, index: int) -> Optional[dict]:
+    return (await asyncio.shield(batch))[index]
+
+
+def _log_revalidation_failure(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Falha ao revalidar previsão em cache: %r", future.exception())
+
+
+forecast_cache = ForecastCache(FORECAST_CACHE_TTL, FORECAST_CACHE_STALE_TTL, FORECAST_CACHE_MAX_ENTRIES)
+
+
+def grid_key(lat: float, lon: float, resolution: float = FORECAST_GRID_RESOLUTION) -> CacheKey:
+    """
+    Centro da célula da grade do modelo que contém o ponto. Cidades na mesma
+    célula recebem a mesma previsão, então compartilham a chave (e a busca).
+    """
+    if resolution <= 0:
+        return ForecastCache.key(lat, lon)
+    return ForecastCache.key(round(float(lat) / resolution) * resolution, round(float(lon) / resolution) * resolution)
+
+
+def _forecast_url(coordinates: List[CacheKey]) -> str:
+    """Monta a URL da previsão; várias coordenadas são enviadas como listas separadas por vírgula."""
+    latitudes = ",".join(str(lat) for lat, _ in coordinates)
+    longitudes = ",".join(str(lon) for _, lon in coordinates)
+    return f"{OPEN_METEO_URL}?latitude={latitudes}&longitude={longitudes}&{FORECAST_QUERY}"
+
+
+async def _request_weather_data(lat: float, lon: float) -> Optional[dict]:
+    """Busca dados meteorológicos diretamente na API com base na latitude e longitude."""
+    return await http_client.get_json(_forecast_url([(lat, lon)]))
+
+
+async def _request_weather_data_batch(coordinates: List[CacheKey]) -> List[Optional[dict]]:
+    """Busca dados meteorológicos de várias coordenadas com uma única requisição à API."""
+    data = await http_client.get_json(_forecast_url(coordinates))
+    if data is None:
+        return [None] * len(coordinates)
+    # Com uma única coordenada a API devolve um objeto em vez de uma lista.
+    results = [data] if isinstance(data, dict) else data
+    if len(results) != len(coordinates):
+        logger.warning("Resposta em lote com %d resultados para %d coordenadas", len(results), len(coordinates))
+        return [None] * len(coordinates)
+    return results
+
+
+async def fetch_weather_data(lat: float, lon: float) -> Optional[dict]:
+    """Busca dados meteorológicos (via cache) da célula da grade que contém a coordenada."""
+    key = grid_key(lat, lon)
+    return await forecast_cache.get(key, functools.partial(_request_weather_data, *key))
+
+
+async def fetch_weather_data_batch(coordinates: List[Tuple[float, float]], max_age: Optional[float] = None) -> List[Optional[dict]]:
+    """
+    Busca dados meteorológicos (via cache) das células da grade que contêm as
+    coordenadas, com uma requisição para as ausentes e para as com mais de
+    `max_age` segundos. Cada célula é pedida uma única vez.
+    """
+    keys = [grid_key(lat, lon) for lat, lon in coordinates]
+    return await forecast_cache.get_many(keys, _request_weather_data_batch, max_age)
 
 
 async def get_weather_data(lat: float, lon: float) -> Optional[dict]:
     """Obtém dados meteorológicos com base na latitude e longitude."""
-    async with aiohttp.ClientSession() as session:
-        return await fetch_weather_data(session, lat, lon)
+    return await fetch_weather_data(lat, lon)
 
 
 def calculate_statistics(weather_data: dict) -> dict:
     """Calcula estatísticas com base nos dados meteorológicos."""
-    stats = {
-        "precipitation_sum": 0,
-        "temperature_min": float('inf'),
-        "temperature_max": float('-inf'),
-        "wind_speed_max": 0,
-        "precipitation_probability_avg": 0,
-        "pressure_avg": 0,
-        "direct_radiation_avg": 0,
-    }
+    return calculate_statistics_for_cities([weather_data])[0]
+
+
+def calculate_statistics_for_cities(weather_data_list: List[dict]) -> List[dict]:
+    """
+    Calcula as estatísticas e o nível de risco de várias cidades em uma única
+    passada vetorizada. As regras de `risk_rules` sobre o horizonte completo
+    definem o nível e os motivos; as horárias acrescentam os intervalos de
+    risco (`risk_windows`) e podem elevar o nível da cidade.
+    """
+    matrices = pack_hourly(weather_data_list)
+    statistics = calculate_statistics_batch(weather_data_list, matrices)
+    windows = find_risk_windows(weather_data_list, matrices)
+    for stats, (risk_level, reasons), city_windows in zip(statistics, assess_statistics(statistics), windows):
+        for window in city_windows:
+            if window["rule"] not in reasons:
+                reasons.append(window["rule"])
+        stats["risk_level"] = highest_severity([risk_level] + [window["severity"] for window in city_windows])
+        stats["reasons"] = reasons
+        stats["risk_windows"] = city_windows
+    return statistics
+
+
+def chunk_cities(cities: Sequence, size: int = WEATHER_BATCH_SIZE) -> List[list]:
+    """Divide a lista de cidades em lotes de tamanho `size`."""
+    return [list(cities[i:i + size]) for i in range(0, len(cities), size)]
+
+
+async def sweep_region(admin_name: str = RS_ADMIN_NAME, max_age: Optional[float] = None) -> Tuple[List[dict], List[Optional[dict]]]:
+    """
+    Varre todas as cidades de um estado; retorna as cidades (na ordem do
+    gazetteer) com estatísticas e as previsões brutas. As cidades são agrupadas
+    pelas células da grade do modelo e cada célula é buscada uma vez. Os lotes
+    são pedidos da célula da cidade mais populosa para a da menos populosa, que
+    é a ordem em que passam pelo orçamento de requisições.
+    """
+    with metrics.stage("cities"):
+        cities = get_cities_in_region(admin_name)
+        cells: Dict[CacheKey, List[int]] = {}
+        for position in get_gazetteer().population_order(admin_name).tolist():
+            cells.setdefault(grid_key(cities[position]["lat"], cities[position]["lon"]), []).append(position)
+        chunks = chunk_cities(list(cells))
+    with metrics.stage("fetch"):
+        tasks = [asyncio.create_task(fetch_weather_data_batch(chunk, max_age)) for chunk in chunks]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    forecasts: List[Optional[dict]] = [None] * len(cities)
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, BaseException):
+            # Um lote que falhou não derruba a varredura: suas cidades ficam sem estatísticas.
+            logger.warning("Falha ao obter previsões de um lote: %r", result)
+            continue
+        for cell, weather_data in zip(chunk, result):
+            for position in cells[cell]:
+                forecasts[position] = weather_data
+    with metrics.stage("statistics"):
+        cities = apply_statistics(cities, forecasts)
+    return cities, forecasts
+
+
+async def get_statistics_for_all_cities(admin_name: str = RS_ADMIN_NAME) -> List[dict]:
+    """Obtém estatísticas meteorológicas para todas as cidades de um estado (por padrão, o Rio Grande do Sul)."""
+    cities, _ = await sweep_region(admin_name)
+    return cities
+
+
+def apply_statistics(cities: List[dict], forecasts: List[Optional[dict]]) -> List[dict]:
+    """
+    Anexa a cada cidade as estatísticas da sua previsão; cidades sem previsão
+    recebem `{}`. Cidades da mesma célula da grade compartilham a previsão, que
+    é calculada uma única vez, e o mesmo dicionário de estatísticas. As
+    estatísticas das janelas (`windows`) são atualizadas de forma incremental a
+    partir da previsão anterior da mesma célula.
+    """
+    cells: Dict[CacheKey, List[int]] = {}
+    for index, weather_data in enumerate(forecasts):
+        if weather_data:
+            city = cities[index]
+            cells.setdefault(grid_key(city["lat"], city["lon"]), []).append(index)
+    statistics = calculate_statistics_for_cities([forecasts[indexes[0]] for indexes in cells.values()])
+    for city in cities:
+        city["stats"] = {}
+    for (cell, indexes), stats in zip(cells.items(), statistics):
+        stats["windows"] = window_stats.update(cell, forecasts[indexes[0]])
+        for index in indexes:
+            cities[index]["stats"] = stats
+    return cities
 
-    hourly_data = weather_data.get("hourly", {})
-    for temp, precip, wind_speed, precipitation_probability, pressure, direct_radiation in zip(hourly_data['temperature_2m'], hourly_data['precipitation'], hourly_data['windspeed_10m'], hourly_data['precipitation_probability'], hourly_data['pressure_msl'], hourly_data['direct_radiation']):
-        if temp is not None:
-            stats["temperature_min"] = min(stats["temperature_min"], temp)
-            stats["temperature_max"] = max(stats["temperature_max"], temp)
-        if precip is not None:
-            stats["precipitation_sum"] += precip
-        if wind_speed is not None:
-            stats["wind_speed_max"] = max(stats["wind_speed_max"], wind_speed)
-        if precipitation_probability is not None:
-            stats["precipitation_probability_avg"] += precipitation_probability
-        if pressure is not None:
-            stats["pressure_avg"] += pressure
-        if direct_radiation is not None:
-            stats["direct_radiation_avg"] += direct_radiation
-
-    daily_data = weather_data.get("daily", {})
-    if daily_data:
-        daily_temp_min = daily_data.get("temperature_2m_min", [])
-        daily_temp_max = daily_data.get("temperature_2m_max", [])
-        daily_precip = daily_data.get("precipitation_sum", [])
-
-        if daily_temp_min:
-            stats["temperature_min"] = min(stats["temperature_min"],
-                                           min(daily_temp_min))
-        if daily_temp_max:
-            stats["temperature_max"] = max(stats["temperature_max"],
-                                           max(daily_temp_max))
-        if daily_precip:
-            stats["precipitation_sum"] += sum(daily_precip)
-
-    if stats["temperature_min"] == float('inf'):
-        stats["temperature_min"] = None
-    if stats["temperature_max"] == float('-inf'):
-        stats["temperature_max"] = None
-
-    if len(hourly_data['precipitation_probability']) > 0:
-        stats["precipitation_probability_avg"] = round(
-            stats["precipitation_probability_avg"] /
-            len(hourly_data['precipitation_probability']), 2
-        )
-    if len(hourly_data['pressure_msl']) > 0:
-        stats["pressure_avg"] = round(
-            stats["pressure_avg"] / len(hourly_data['pressure_msl']), 2
-        )
-    if len(hourly_data['direct_radiation']) > 0:
-        stats["direct_radiation_avg"] = round(
-            stats["direct_radiation_avg"] / len(hourly_data['direct_radiation']), 2
-        )
-
-    stats["risk_level"] = assess_risk(stats)
-    return stats
-
-
-def assess_risk(stats: dict) -> Tuple[str, List[str]]:
-    """Avalia o nível de risco com base nas estatísticas meteorológicas."""
-    reasons = []
-    if stats["precipitation_sum"] >= 50:
-        reasons.append("alta precipitação")
-    if stats["wind_speed_max"] >= 50:
-        reasons.append("alta velocidade do vento")
-    if stats["temperature_max"] >= 40:
-        reasons.append("temperatura máxima alta")
-    if stats["temperature_min"] < -5:
-        reasons.append("temperatura mínima baixa")
-    if stats["pressure_avg"] <= 900:
-        reasons.append("baixa pressão atmosférica")
-    if stats["direct_radiation_avg"] >= 500:
-        reasons.append("alta radiação solar direta")
-
-    if reasons:
-        risk_level = "PERIGO"
-    else:
-        risk_level = "SEGURO"
 
-    return risk_level, reasons
+async def fetch_cities_statistics(cities: List[dict]) -> List[dict]:
+    """Obtém as estatísticas meteorológicas de um lote de cidades com uma única requisição."""
+    forecasts = await fetch_weather_data_batch([(city["lat"], city["lon"]) for city in cities])
+    return apply_statistics(cities, forecasts)
 
 
-async def get_statistics_for_all_cities() -> List[dict]:
-    """Obtém estatísticas meteorológicas para todas as cidades do Rio Grande do Sul."""
-    cities = get_cities_rio_grande_do_sul()
-    async with aiohttp.ClientSession() as session:
-        tasks = [asyncio.create_task(fetch_city_statistics(session, city)) for city in cities]
-        return await asyncio.gather(*tasks)
+async def _fetch_chunk_statistics(cities: List[dict]) -> List[dict]:
+    try:
+        return await fetch_cities_statistics(cities)
+    except Exception as exc:
+        logger.warning("Falha ao obter estatísticas de um lote: %r", exc)
+        return apply_statistics(cities, [None] * len(cities))
 
 
-async def fetch_city_statistics(session: aiohttp.ClientSession, city: dict) -> dict:
-    """Obtém as estatísticas meteorológicas de uma cidade."""
-    lat, lon = city["lat"], city["lon"]
-    weather_data = await fetch_weather_data(session, lat, lon)
-    if weather_data:
-        stats = calculate_statistics(weather_data)
-        risk_level, reasons = assess_risk(stats)
-        stats["risk_level"] = risk_level
-        stats["reasons"] = reasons
-        city["stats"] = stats
-    else:
-        city["stats"] = {}
-    return city
+async def iter_statistics_for_all_cities(admin_name: str = RS_ADMIN_NAME) -> AsyncIterator[dict]:
+    """Produz as estatísticas de cada cidade do estado assim que o seu lote é concluído."""
+    tasks = [asyncio.create_task(_fetch_chunk_statistics(chunk)) for chunk in chunk_cities(get_cities_in_region(admin_name))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for city in await next_done:
+                yield city
+    finally:
+        # O cliente pode desconectar no meio do fluxo.
+        for task in tasks:
+            task.cancel()
 
 
 def filter_cities(cities: List[dict], criteria: dict) -> List[dict]:
     """Filtra as cidades com base nos critérios especificados."""
-    filtered = []
-    for city in cities:
-        stats = city.get("stats", {})
-        if all(stats.get(k) is not None and stats.get(k) >= v for k, v in criteria.items()):
-            filtered.append(city)
-    return filtered
+    return CityIndex(cities).query(minimums=criteria)
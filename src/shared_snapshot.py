@@ -0,0 +1,151 @@
+import mmap
+import os
+import re
+import socket
+import struct
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import models
+
+SHARED_SNAPSHOT_PATH = os.getenv("SHARED_SNAPSHOT_PATH")  # ex.: data/weather_snapshot.bin (um arquivo por região); vazio desativa
+SNAPSHOT_LEASE_TTL = float(os.getenv("SNAPSHOT_LEASE_TTL", "300"))
+SNAPSHOT_POLL_INTERVAL = float(os.getenv("SNAPSHOT_POLL_INTERVAL", "5"))
+
+LEASE_NAME = "weather_snapshot"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+MAGIC = b"ICSNAP1\n"
+_HEADER_LENGTH = struct.Struct("<I")
+
+Section = Tuple[int, int]  # deslocamento e tamanho dentro da área de dados
+
+
+async def acquire_lease(db: AsyncSession, owner: str = WORKER_ID, ttl: float = SNAPSHOT_LEASE_TTL,
+                        name: str = LEASE_NAME) -> bool:
+    """
+    Obtém ou renova a concessão `name` por `ttl` segundos. Só um processo a
+    detém por vez; ela passa para outro quando expira sem ser renovada.
+    """
+    now = time.time()
+    await db.execute(
+        text(
+            "INSERT INTO snapshot_leases (name, owner, expires_at) VALUES (:name, :owner, :expires_at) "
+            "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE snapshot_leases.owner = excluded.owner OR snapshot_leases.expires_at < :now"
+        ),
+        {"name": name, "owner": owner, "expires_at": now + ttl, "now": now},
+    )
+    await db.commit()
+    result = await db.execute(select(models.SnapshotLease.owner).where(models.SnapshotLease.name == name))
+    return result.scalar() == owner
+
+
+async def release_lease(db: AsyncSession, owner: str = WORKER_ID, name: str = LEASE_NAME) -> None:
+    await db.execute(
+        delete(models.SnapshotLease).where(models.SnapshotLease.name == name, models.SnapshotLease.owner == owner)
+    )
+    await db.commit()
+
+
+@dataclass(frozen=True)
+class SnapshotFile:
+    """
+    Conteúdo de um arquivo de snapshot mapeado em memória. Os corpos e
+    fragmentos são `memoryview`s sobre o mapeamento, sem cópia.
+    """
+    version: int
+    generated_at: str
+    etag: str
+    bodies: Dict[str, memoryview]
+    fragments: Tuple[memoryview, ...]
+
+
+def write_snapshot_file(path: str, version: int, generated_at: str, etag: str,
+                        bodies: Dict[str, bytes], fragment_lengths: List[int]) -> None:
+    """
+    Grava o snapshot de forma atômica (arquivo temporário + rename). Leitores
+    que já mapearam a versão anterior continuam com ela até relerem o arquivo.
+    Formato: MAGIC, tamanho do cabeçalho (uint32), cabeçalho JSON e os corpos.
+    """
+    sections: Dict[str, Section] = {}
+    offset = 0
+    for encoding, body in bodies.items():
+        sections[encoding] = (offset, len(body))
+        offset += len(body)
+    header = orjson.dumps({
+        "version": version,
+        "generated_at": generated_at,
+        "etag": etag,
+        "sections": sections,
+        "fragments": fragment_lengths,
+    })
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as snapshot_file:
+            snapshot_file.write(MAGIC)
+            snapshot_file.write(_HEADER_LENGTH.pack(len(header)))
+            snapshot_file.write(header)
+            for body in bodies.values():
+                snapshot_file.write(body)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def read_snapshot_file(path: str) -> Optional[SnapshotFile]:
+    """Mapeia o arquivo de snapshot em memória; retorna None se ele não existir ou estiver vazio."""
+    try:
+        with open(path, "rb") as snapshot_file:
+            if os.fstat(snapshot_file.fileno()).st_size == 0:
+                return None
+            mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+    view = memoryview(mapped)
+    if view[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Invalid snapshot file: {path}")
+    start = len(MAGIC) + _HEADER_LENGTH.size
+    (header_length,) = _HEADER_LENGTH.unpack(view[len(MAGIC):start])
+    header = orjson.loads(view[start:start + header_length])
+    data = view[start + header_length:]
+    bodies = {encoding: data[offset:offset + length] for encoding, (offset, length) in header["sections"].items()}
+
+    # Os fragmentos (JSON de cada cidade) ficam no corpo sem compressão: "[" f1 "," f2 ... "]"
+    fragments = []
+    position = 1
+    identity = bodies["identity"]
+    for length in header["fragments"]:
+        fragments.append(identity[position:position + length])
+        position += length + 1
+    return SnapshotFile(header["version"], header["generated_at"], header["etag"], bodies, tuple(fragments))
+
+
+def region_path(path: str, region_key: str) -> str:
+    """Arquivo do snapshot de uma região: data/weather_snapshot.bin -> data/weather_snapshot.rio-grande-do-sul.bin"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{re.sub(r'[^a-z0-9]+', '-', region_key).strip('-')}{extension}"
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Identifica a versão do arquivo no disco (inode e mtime) sem abri-lo."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
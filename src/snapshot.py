@@ -0,0 +1,361 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from src import history, metrics, shared_snapshot
+from src.database import AsyncSessionLocal
+from src.gazetteer import state_key
+from src.query import CityIndex
+from src.responses import Body, EncodedBody, dumps, encode_body, join_array
+from src.risk_rules import SEVERITY_LEVELS, highest_severity
+from src.scheduler import (SWEEP_ATTENTION_INTERVAL, SWEEP_HIGH_RISK_INTERVAL, SWEEP_REGIONS, Region, SweepScheduler,
+                           region_from_name)
+from src.services import RS_ADMIN_NAME, sweep_region
+from src.window_stats import window_city
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_REFRESH_INTERVAL = float(os.getenv("SNAPSHOT_REFRESH_INTERVAL", "900"))
+SNAPSHOT_WAIT_TIMEOUT = float(os.getenv("SNAPSHOT_WAIT_TIMEOUT", "30"))
+# Segundos informados no Retry-After quando um worker ainda não tem o snapshot da região.
+SNAPSHOT_RETRY_AFTER = int(os.getenv("SNAPSHOT_RETRY_AFTER", "5"))
+HISTORY_COMPACT_INTERVAL = float(os.getenv("HISTORY_COMPACT_INTERVAL", "3600"))
+
+
+@dataclass(frozen=True)
+class WeatherSnapshot:
+    """
+    Estatísticas de todas as cidades geradas por uma varredura. Não deve ser
+    modificado. `fragments` guarda o JSON de cada cidade e `body` a lista
+    completa já serializada e comprimida, prontos para envio.
+    """
+    version: int
+    generated_at: datetime
+    cities: Tuple[dict, ...]
+    index: CityIndex
+    fragments: Tuple[Body, ...]
+    body: EncodedBody
+    views: Dict[str, "WeatherSnapshot"] = field(default_factory=dict, compare=False, repr=False)
+
+    def window_view(self, window: str) -> "WeatherSnapshot":
+        """
+        Snapshot com as estatísticas de uma janela (ex.: "6h") no lugar das do
+        horizonte completo, montado na primeira consulta e reaproveitado depois.
+        """
+        view = self.views.get(window)
+        if view is None:
+            cities = tuple(window_city(city, window) for city in self.cities)
+            fragments = tuple(dumps(city) for city in cities)
+            view = WeatherSnapshot(self.version, self.generated_at, cities, CityIndex(cities), fragments,
+                                   encode_body(join_array(fragments)))
+            self.views[window] = view
+        return view
+
+
+def load_shared_snapshot(path: str) -> Optional[WeatherSnapshot]:
+    """
+    Monta um snapshot a partir do arquivo compartilhado: os corpos e fragmentos
+    continuam no mapeamento em memória e só as cidades (para os índices) são decodificadas.
+    """
+    shared = shared_snapshot.read_snapshot_file(path)
+    if shared is None:
+        return None
+    cities = orjson.loads(shared.bodies["identity"])
+    return WeatherSnapshot(
+        version=shared.version,
+        generated_at=datetime.fromisoformat(shared.generated_at),
+        cities=tuple(cities),
+        index=CityIndex(cities),
+        fragments=shared.fragments,
+        body=EncodedBody(shared.bodies["identity"], shared.etag, shared.bodies.get("gzip"), shared.bodies.get("br")),
+    )
+
+
+def save_shared_snapshot(path: str, snapshot: WeatherSnapshot) -> None:
+    shared_snapshot.write_snapshot_file(
+        path,
+        snapshot.version,
+        snapshot.generated_at.isoformat(),
+        snapshot.body.etag,
+        snapshot.body.variants(),
+        [len(fragment) for fragment in snapshot.fragments],
+    )
+
+
+class SnapshotUnavailable(Exception):
+    """Nenhum snapshot da região foi publicado ainda e este processo não deve varrê-la."""
+
+
+class SnapshotStore:
+    """
+    Guarda o snapshot mais recente; a publicação troca a referência de forma
+    atômica. Há no máximo uma atualização em andamento por vez (`refresh`).
+    """
+
+    def __init__(self):
+        self._current: Optional[WeatherSnapshot] = None
+        self._version = 0
+        self._published = asyncio.Event()
+        self._refreshing: Optional[asyncio.Future] = None
+
+    @property
+    def current(self) -> Optional[WeatherSnapshot]:
+        return self._current
+
+    def publish(self, cities: List[dict]) -> WeatherSnapshot:
+        # Serializa uma única vez por atualização; as rotas só enviam os bytes.
+        fragments = tuple(dumps(city) for city in cities)
+        self._version += 1
+        snapshot = WeatherSnapshot(
+            version=self._version,
+            generated_at=datetime.now(timezone.utc),
+            cities=tuple(cities),
+            index=CityIndex(cities),
+            fragments=fragments,
+            body=encode_body(join_array(fragments)),
+        )
+        self._current = snapshot
+        self._published.set()
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def publish_snapshot(self, snapshot: WeatherSnapshot) -> WeatherSnapshot:
+        """Publica um snapshot já montado (por exemplo, lido do arquivo compartilhado)."""
+        self._version = max(self._version, snapshot.version)
+        self._current = snapshot
+        self._published.set()
+        return snapshot
+
+    @property
+    def refreshing(self) -> bool:
+        return self._refreshing is not None
+
+    async def refresh(self, sweep: Callable[[], Awaitable[WeatherSnapshot]]) -> WeatherSnapshot:
+        """
+        Atualiza o snapshot com `sweep`. Chamadas simultâneas aguardam a mesma
+        atualização em vez de iniciar outra varredura.
+        """
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(sweep())
+            self._refreshing.add_done_callback(self._refresh_done)
+        return await asyncio.shield(self._refreshing)
+
+    def _refresh_done(self, future: asyncio.Future) -> None:
+        self._refreshing = None
+        if not future.cancelled():
+            future.exception()  # evita o aviso de exceção não lida quando ninguém mais aguarda
+
+    async def wait(self, timeout: float) -> Optional[WeatherSnapshot]:
+        """Aguarda a primeira publicação por até `timeout` segundos."""
+        if self._current is None:
+            try:
+                await asyncio.wait_for(self._published.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._current
+
+
+# Intervalo de atualização de cada região conforme o maior nível de risco entre as suas cidades.
+REGION_INTERVALS = {
+    SEVERITY_LEVELS[0]: SNAPSHOT_REFRESH_INTERVAL,
+    SEVERITY_LEVELS[1]: SWEEP_ATTENTION_INTERVAL,
+    SEVERITY_LEVELS[2]: SWEEP_HIGH_RISK_INTERVAL,
+}
+
+RS_REGION = region_from_name(RS_ADMIN_NAME)
+
+# O Rio Grande do Sul é sempre varrido, pois /locations/rs depende dele.
+sweep_scheduler = SweepScheduler([region_from_name(name) for name in SWEEP_REGIONS] + [RS_REGION], REGION_INTERVALS)
+region_snapshots: Dict[str, SnapshotStore] = {key: SnapshotStore() for key in sweep_scheduler.regions}
+weather_snapshots = region_snapshots[RS_REGION.key]
+
+
+def has_fresh_stats(city: dict) -> bool:
+    """Se a cidade tem estatísticas desta varredura, e não as preenchidas pelo histórico."""
+    stats = city.get("stats") or {}
+    return bool(stats) and not stats.get("stale")
+
+
+def region_severity(cities: Tuple[dict, ...]) -> str:
+    """Maior nível de risco entre as cidades de uma região."""
+    return highest_severity([city["stats"]["risk_level"] for city in cities if city.get("stats", {}).get("risk_level")])
+
+
+_last_compaction = 0.0
+
+
+async def _persist_sweep(region: str, cities: List[dict], forecasts: List[Optional[dict]], recorded_at: datetime,
+                         record_history: bool = True) -> None:
+    """
+    Grava a varredura no histórico (se `record_history`) e completa as cidades
+    sem previsão com o último dado conhecido.
+    """
+    global _last_compaction
+    async with AsyncSessionLocal() as db:
+        if record_history:
+            await history.record_sweep(db, region, cities, forecasts, recorded_at)
+        await history.fill_from_history(db, region, cities)
+        if record_history and time.monotonic() - _last_compaction >= HISTORY_COMPACT_INTERVAL:
+            await history.compact_history(db, recorded_at)
+            _last_compaction = time.monotonic()
+
+
+async def refresh_snapshot(store: SnapshotStore = weather_snapshots, admin_name: str = RS_ADMIN_NAME,
+                           max_age: Optional[float] = None, record_history: bool = True) -> WeatherSnapshot:
+    """
+    Recalcula as estatísticas das cidades de um estado, grava o histórico (só
+    nas varreduras agendadas) e publica um novo snapshot. Previsões em cache
+    com até `max_age` segundos são reaproveitadas.
+    """
+    cities, forecasts = await sweep_region(admin_name, max_age)
+    try:
+        with metrics.stage("persist"):
+            await _persist_sweep(state_key(admin_name), cities, forecasts, datetime.utcnow(), record_history)
+    except Exception:
+        logger.exception("Falha ao gravar o histórico de previsões")
+    with metrics.stage("publish"):
+        snapshot = store.publish(cities)
+    logger.info("Snapshot %d de %s publicado com %d cidades", snapshot.version, admin_name, len(snapshot.cities))
+    return snapshot
+
+
+async def refresh_region(region: Region, scheduler: SweepScheduler = sweep_scheduler) -> WeatherSnapshot:
+    """
+    Atualiza o snapshot de uma região e agenda a próxima varredura conforme o
+    risco encontrado. Se nenhuma cidade recebeu previsão nova (API fora do ar),
+    a região volta a ser varrida após o intervalo de nova tentativa.
+    """
+    store = region_snapshots[region.key]
+    snapshot = await store.refresh(
+        functools.partial(refresh_snapshot, store, region.admin_name, scheduler.interval_for(region.severity))
+    )
+    if snapshot.cities and not any(has_fresh_stats(city) for city in snapshot.cities):
+        logger.warning("Nenhuma previsão nova para %s; nova tentativa agendada", region.admin_name)
+        scheduler.mark_failed(region)
+    else:
+        scheduler.mark_refreshed(region, region_severity(snapshot.cities), snapshot.generated_at.timestamp())
+    return snapshot
+
+
+class SharedSnapshotSync:
+    """
+    Compartilha os snapshots entre os workers de um mesmo host, com um arquivo
+    por região. O worker que detém a concessão (tabela `snapshot_leases`) roda o
+    agendador de varreduras e grava os arquivos; os demais só mapeiam cada
+    arquivo quando ele muda.
+    """
+
+    def __init__(self, path: str, stores: Dict[str, SnapshotStore], scheduler: SweepScheduler):
+        self.path = path
+        self.stores = stores
+        self.scheduler = scheduler
+        self._signatures: Dict[str, Optional[Tuple[int, int]]] = {}
+        self.is_leader = False
+
+    def region_path(self, region: Region) -> str:
+        return shared_snapshot.region_path(self.path, region.key)
+
+    async def load_if_changed(self, region: Region) -> Optional[WeatherSnapshot]:
+        path = self.region_path(region)
+        signature = shared_snapshot.file_signature(path)
+        if signature is None or signature == self._signatures.get(region.key):
+            return None
+        snapshot = await asyncio.to_thread(load_shared_snapshot, path)
+        self._signatures[region.key] = signature
+        store = self.stores[region.key]
+        # Cada processo numera as suas versões; a ordem vem do horário de geração do líder.
+        if snapshot is None or (store.current is not None and snapshot.generated_at <= store.current.generated_at):
+            return None
+        logger.info("Snapshot %d carregado de %s", snapshot.version, path)
+        # Quem assumir a concessão continua do agendamento do líder anterior.
+        self.scheduler.mark_refreshed(region, region_severity(snapshot.cities), snapshot.generated_at.timestamp())
+        return store.publish_snapshot(snapshot)
+
+    async def sync(self) -> None:
+        """Uma rodada: carrega as versões mais novas dos arquivos e renova (ou tenta obter) a concessão."""
+        for region in self.scheduler.regions.values():
+            if not region.refreshing:
+                await self.load_if_changed(region)
+        async with AsyncSessionLocal() as db:
+            self.is_leader = await shared_snapshot.acquire_lease(db)
+
+    async def refresh(self, region: Region) -> WeatherSnapshot:
+        snapshot = await refresh_region(region, self.scheduler)
+        path = self.region_path(region)
+        await asyncio.to_thread(save_shared_snapshot, path, snapshot)
+        self._signatures[region.key] = shared_snapshot.file_signature(path)
+        return snapshot
+
+    async def release(self) -> None:
+        if self.is_leader:
+            async with AsyncSessionLocal() as db:
+                await shared_snapshot.release_lease(db)
+            self.is_leader = False
+
+    async def _poll(self, poll_interval: float) -> None:
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falha ao sincronizar o snapshot compartilhado")
+            await asyncio.sleep(poll_interval)
+
+    async def run(self, poll_interval: float = shared_snapshot.SNAPSHOT_POLL_INTERVAL) -> None:
+        try:
+            await asyncio.gather(self._poll(poll_interval), self.scheduler.run(self.refresh, lambda: self.is_leader))
+        finally:
+            # Libera a concessão para que outro worker assuma sem esperar ela expirar.
+            with suppress(Exception):
+                await self.release()
+
+
+async def run_refresh_loop(scheduler: SweepScheduler = sweep_scheduler,
+                           shared_path: Optional[str] = shared_snapshot.SHARED_SNAPSHOT_PATH) -> None:
+    """
+    Atualiza os snapshots das regiões (SWEEP_REGIONS) conforme o agendador até
+    ser cancelado. Com `shared_path` (SHARED_SNAPSHOT_PATH), só um dos workers
+    consulta a API e os demais leem os arquivos compartilhados.
+    """
+    if shared_path:
+        await SharedSnapshotSync(shared_path, region_snapshots, scheduler).run()
+        return
+    await scheduler.run(functools.partial(refresh_region, scheduler=scheduler))
+
+
+async def get_snapshot(region: Region = RS_REGION) -> WeatherSnapshot:
+    """
+    Retorna o snapshot atual de uma região. Sem snapshot publicado, aguarda a
+    atualização em andamento ou faz uma varredura sob demanda, compartilhada
+    entre as requisições simultâneas e sem gravar histórico. Com o snapshot
+    compartilhado (SHARED_SNAPSHOT_PATH) só o líder varre: os demais workers
+    aguardam o arquivo e, se ele não aparecer, levantam SnapshotUnavailable.
+    """
+    store = region_snapshots[region.key]
+    if store.current is not None:
+        return store.current
+    if store.refreshing or not shared_snapshot.SHARED_SNAPSHOT_PATH:
+        return await store.refresh(
+            functools.partial(refresh_snapshot, store, region.admin_name, record_history=False)
+        )
+    snapshot = await store.wait(SNAPSHOT_WAIT_TIMEOUT)
+    if snapshot is None:
+        path = shared_snapshot.region_path(shared_snapshot.SHARED_SNAPSHOT_PATH, region.key)
+        snapshot = await asyncio.to_thread(load_shared_snapshot, path)
+        if snapshot is not None:
+            store.publish_snapshot(snapshot)
+    if snapshot is None:
+        raise SnapshotUnavailable(region.admin_name)
+    return snapshot
@@ -0,0 +1,136 @@
+import math
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+SPATIAL_CELL_SIZE = float(os.getenv("SPATIAL_CELL_SIZE", "0.1"))  # graus (~11 km)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+Cell = Tuple[int, int]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distância em quilômetros entre dois pontos na superfície da Terra."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class GridIndex:
+    """
+    Índice espacial em grade regular (lat/lon) para consultas por raio e
+    k vizinhos mais próximos. Inserções, atualizações e remoções são O(1) e
+    as consultas visitam apenas as células próximas ao ponto.
+    """
+
+    def __init__(self, cell_size: float = SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._cells: Dict[Cell, Set[int]] = {}
+        # Limites (linha mín., linha máx., coluna mín., coluna máx.) das células já ocupadas
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+        self.loaded = False
+        self.version: Optional[int] = None  # versão dos dados de origem que o índice reflete
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def insert(self, key: int, lat: float, lon: float) -> None:
+        self.remove(key)
+        self._points[key] = (lat, lon)
+        row, column = self._cell(lat, lon)
+        self._cells.setdefault((row, column), set()).add(key)
+        if self._bounds is None:
+            self._bounds = (row, row, column, column)
+        else:
+            min_row, max_row, min_column, max_column = self._bounds
+            self._bounds = (min(min_row, row), max(max_row, row), min(min_column, column), max(max_column, column))
+
+    def remove(self, key: int) -> None:
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        members = self._cells[cell]
+        members.discard(key)
+        if not members:
+            del self._cells[cell]
+
+    def clear(self) -> None:
+        self._points.clear()
+        self._cells.clear()
+        self._bounds = None
+        self.loaded = False
+        self.version = None
+
+    def _ring(self, center: Cell, radius: int):
+        """Células na borda do quadrado de raio `radius` (em células) ao redor de `center`."""
+        row, column = center
+        if radius == 0:
+            yield center
+            return
+        for offset in range(-radius, radius + 1):
+            yield row - radius, column + offset
+            yield row + radius, column + offset
+        for offset in range(-radius + 1, radius):
+            yield row + offset, column - radius
+            yield row + offset, column + radius
+
+    def _ring_distance_km(self, lat: float, radius: int) -> float:
+        """Limite inferior da distância até qualquer ponto fora dos anéis já visitados."""
+        max_lat = min(89.9, abs(lat) + (radius + 1) * self.cell_size)
+        return max(0, radius - 1) * self.cell_size * KM_PER_DEGREE * math.cos(math.radians(max_lat))
+
+    def _max_ring(self, center: Cell) -> int:
+        if self._bounds is None:
+            return -1
+        min_row, max_row, min_column, max_column = self._bounds
+        row, column = center
+        return max(abs(row - min_row), abs(row - max_row), abs(column - min_column), abs(column - max_column))
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[int, float]]:
+        """Os `k` pontos mais próximos, como pares (chave, distância em km) em ordem crescente."""
+        center = self._cell(lat, lon)
+        max_ring = self._max_ring(center)
+        found: List[Tuple[float, int]] = []
+        radius = 0
+        while radius <= max_ring:
+            for cell in self._ring(center, radius):
+                for key in self._cells.get(cell, ()):
+                    found.append((haversine_km(lat, lon, *self._points[key]), key))
+            found.sort()
+            if len(found) >= k and found[k - 1][0] <= self._ring_distance_km(lat, radius + 1):
+                break
+            radius += 1
+        return [(key, distance) for distance, key in found[:k]]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """Pontos a até `radius_km` quilômetros, como pares (chave, distância em km) em ordem crescente."""
+        lat_cells = math.ceil(radius_km / (self.cell_size * KM_PER_DEGREE))
+        cos_lat = max(math.cos(math.radians(min(89.9, abs(lat) + radius_km / KM_PER_DEGREE))), 1e-6)
+        lon_cells = math.ceil(radius_km / (self.cell_size * KM_PER_DEGREE * cos_lat))
+        row, column = self._cell(lat, lon)
+        if (2 * lat_cells + 1) * (2 * lon_cells + 1) > len(self._cells):
+            # Raio maior que a área ocupada: é mais barato percorrer as células existentes.
+            cells = [cell for cell in self._cells
+                     if abs(cell[0] - row) <= lat_cells and abs(cell[1] - column) <= lon_cells]
+        else:
+            cells = [(cell_row, cell_column)
+                     for cell_row in range(row - lat_cells, row + lat_cells + 1)
+                     for cell_column in range(column - lon_cells, column + lon_cells + 1)]
+        results = []
+        for cell in cells:
+            for key in self._cells.get(cell, ()):
+                distance = haversine_km(lat, lon, *self._points[key])
+                if distance <= radius_km:
+                    results.append((key, distance))
+        return sorted(results, key=lambda item: item[1])
+
+
+donation_index = GridIndex()
@@ -0,0 +1,63 @@
+"""
+Relatório do tempo de importação da aplicação (partida a frio):
+
+    python -m src.startup_report --top 20
+
+Executa `python -X importtime -c "import src.main"` num processo novo, lista os
+módulos mais lentos e termina com código 1 se o total passar de STARTUP_BUDGET_MS.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "2500"))
+APP_MODULE = "src.main"
+
+ImportTiming = Tuple[str, int, float, float]  # módulo, profundidade, próprio (ms), acumulado (ms)
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """Interpreta as linhas `import time: self [us] | cumulative | imported package`."""
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        depth = (len(module) - len(module.lstrip(" "))) // 2
+        timings.append((module.strip(), depth, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return timings
+
+
+def measure_imports(module: str = APP_MODULE) -> List[ImportTiming]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default=APP_MODULE)
+    parser.add_argument("--top", type=int, default=15, help="quantidade de módulos listados")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    timings = measure_imports(args.module)
+    total_ms = next((cumulative for module, _, _, cumulative in timings if module == args.module), 0.0)
+    top_level = [timing for timing in timings if timing[1] <= 1]
+
+    print(f"{'módulo':50} {'próprio (ms)':>14} {'acumulado (ms)':>16}")
+    for module, depth, self_ms, cumulative_ms in sorted(top_level, key=lambda timing: -timing[3])[:args.top]:
+        print(f"{'  ' * depth + module:50} {self_ms:14.1f} {cumulative_ms:16.1f}")
+    print(f"\nImportação de {args.module}: {total_ms:.0f} ms (orçamento: {args.budget_ms:.0f} ms)")
+    if total_ms > args.budget_ms:
+        print("Orçamento de inicialização excedido", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from typing import BinaryIO, FrozenSet, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+
+IDENTITY_PHOTO_DIR = os.getenv("IDENTITY_PHOTO_DIR", "identity_photos")
+IDENTITY_PHOTO_MAX_BYTES = int(os.getenv("IDENTITY_PHOTO_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+# Tipos aceitos para a foto de identidade (Content-Type da parte do formulário); vazio aceita qualquer um.
+IDENTITY_PHOTO_TYPES = frozenset(
+    content_type.strip().lower()
+    for content_type in os.getenv("IDENTITY_PHOTO_TYPES", "image/jpeg,image/png,image/webp,image/heic").split(",")
+    if content_type.strip()
+)
+# Folga para os cabeçalhos e delimitadores do multipart, além do próprio arquivo.
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+class UploadTooLargeError(Exception):
+    """O arquivo enviado excede o tamanho máximo permitido."""
+
+
+class UnsupportedUploadTypeError(Exception):
+    """O tipo do arquivo enviado não está entre os aceitos."""
+
+
+class BodySizeLimitMiddleware:
+    """
+    Middleware ASGI que limita o corpo das requisições às rotas de upload antes
+    que o formulário seja lido: recusa de imediato um Content-Length acima de
+    `max_bytes` e interrompe com 413 a leitura do corpo que passar do limite.
+    """
+
+    def __init__(self, app, paths: Tuple[str, ...], max_bytes: int = IDENTITY_PHOTO_MAX_BYTES + UPLOAD_FORM_OVERHEAD):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": "File too large"}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _extension(filename: str) -> str:
+    """Extensão do nome original, em minúsculas, ou vazio se não for segura."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if _EXTENSION.match(extension) else ""
+
+
+def content_path(directory: str, digest: str, extension: str) -> str:
+    """Caminho do arquivo pelo hash: <dir>/ab/cd/<sha256><ext>."""
+    return os.path.join(directory, digest[:2], digest[2:4], digest + extension)
+
+
+def _write_chunk(file: BinaryIO, chunk: bytes) -> None:
+    file.write(chunk)
+
+
+def _finish(file: BinaryIO, temp_path: str, path: str) -> None:
+    """Fecha o temporário e o move para o destino; se o conteúdo já existe, descarta a cópia."""
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+    if os.path.exists(path):
+        os.remove(temp_path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+
+
+def _discard(file: BinaryIO, temp_path: str) -> None:
+    file.close()
+    try:
+        os.remove(temp_path)
+    except FileNotFoundError:
+        pass
+
+
+def _open_temp(directory: str) -> Tuple[BinaryIO, str]:
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    return os.fdopen(descriptor, "wb"), temp_path
+
+
+async def store_upload(
+    upload: UploadFile,
+    directory: str = IDENTITY_PHOTO_DIR,
+    max_bytes: int = IDENTITY_PHOTO_MAX_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    allowed_types: FrozenSet[str] = IDENTITY_PHOTO_TYPES,
+) -> str:
+    """
+    Grava o upload em blocos de `chunk_size` bytes, calculando o SHA-256 durante
+    a cópia, e o publica atomicamente (arquivo temporário + rename) num caminho
+    derivado do hash. Arquivos com o mesmo conteúdo são gravados uma única vez.
+    Lança UploadTooLargeError se o arquivo passar de `max_bytes` e
+    UnsupportedUploadTypeError se o tipo não estiver em `allowed_types`.
+    """
+    content_type = (upload.content_type or "").split(";")[0].strip().lower()
+    if allowed_types and content_type not in allowed_types:
+        raise UnsupportedUploadTypeError(f"Unsupported upload type: {content_type or 'unknown'}")
+    file, temp_path = await asyncio.to_thread(_open_temp, directory)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+            digest.update(chunk)
+            await asyncio.to_thread(_write_chunk, file, chunk)
+        path = content_path(directory, digest.hexdigest(), _extension(upload.filename))
+        await asyncio.to_thread(_finish, file, temp_path, path)
+    except BaseException:
+        await asyncio.to_thread(_discard, file, temp_path)
+        raise
+    return path
@@ -0,0 +1,108 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+HOURLY_FIELDS = (
+    "temperature_2m",
+    "precipitation",
+    "windspeed_10m",
+    "precipitation_probability",
+    "pressure_msl",
+    "direct_radiation",
+)
+DAILY_FIELDS = ("temperature_2m_min", "temperature_2m_max", "precipitation_sum")
+
+
+def pack_series(series_list: Sequence[Optional[list]]) -> np.ndarray:
+    """
+    Empacota séries de tamanhos variados numa matriz (horas × cidades).
+    Valores None e posições além do fim de cada série viram NaN.
+    """
+    length = max((len(series) for series in series_list if series), default=0)
+    matrix = np.full((length, len(series_list)), np.nan)
+    for column, series in enumerate(series_list):
+        if series:
+            matrix[:len(series), column] = np.asarray(series, dtype=float)
+    return matrix
+
+
+def pack_hourly(weather_data_list: Sequence[dict], fields: Sequence[str] = HOURLY_FIELDS) -> Dict[str, np.ndarray]:
+    """Matrizes (horas × cidades) dos campos horários informados, para reaproveitar entre cálculos."""
+    hourly = [weather_data.get("hourly") or {} for weather_data in weather_data_list]
+    return {field: pack_series([data.get(field) for data in hourly]) for field in fields}
+
+
+def _lengths(series_list: Sequence[Optional[list]]) -> np.ndarray:
+    return np.array([len(series) if series else 0 for series in series_list])
+
+
+def _reduce(ufunc: np.ufunc, matrix: np.ndarray) -> np.ndarray:
+    """Reduz ao longo das horas; colunas sem nenhum valor resultam em NaN."""
+    if matrix.shape[0] == 0:
+        return np.full(matrix.shape[1], np.nan)
+    return ufunc.reduce(matrix, axis=0)
+
+
+def _masked_sum(matrix: np.ndarray) -> np.ndarray:
+    # A soma acumulada percorre as horas em sequência, na mesma ordem da soma em
+    # Python, então os totais são idênticos bit a bit. (`np.add.reduce` usa soma
+    # em pares quando há uma única coluna e difere na última casa.)
+    if matrix.shape[0] == 0:
+        return np.zeros(matrix.shape[1])
+    return np.cumsum(np.where(np.isnan(matrix), 0.0, matrix), axis=0)[-1]
+
+
+def _average(totals: np.ndarray, lengths: np.ndarray, index: int):
+    if lengths[index] > 0:
+        return round(float(totals[index]) / int(lengths[index]), 2)
+    return 0
+
+
+def calculate_statistics_batch(weather_data_list: Sequence[dict],
+                               matrices: Optional[Dict[str, np.ndarray]] = None) -> List[dict]:
+    """
+    Calcula as estatísticas de várias cidades de uma só vez, em passadas
+    vetorizadas sobre matrizes (horas × cidades). O resultado de cada cidade é
+    o mesmo de `services.calculate_statistics`, sem o nível de risco.
+    `matrices` permite reaproveitar o resultado de `pack_hourly`.
+    """
+    matrices = matrices if matrices is not None else pack_hourly(weather_data_list)
+    hourly = [weather_data.get("hourly") or {} for weather_data in weather_data_list]
+    daily = [weather_data.get("daily") or {} for weather_data in weather_data_list]
+    series = {field: [data.get(field) for data in hourly] for field in HOURLY_FIELDS}
+    daily_series = {field: [data.get(field) for data in daily] for field in DAILY_FIELDS}
+
+    temperature = matrices["temperature_2m"]
+    precipitation = matrices["precipitation"]
+    wind_speed = matrices["windspeed_10m"]
+    daily_temp_min = pack_series(daily_series["temperature_2m_min"])
+    daily_temp_max = pack_series(daily_series["temperature_2m_max"])
+    daily_precip = pack_series(daily_series["precipitation_sum"])
+
+    temperature_min = np.fmin(_reduce(np.fmin, temperature), _reduce(np.fmin, daily_temp_min))
+    temperature_max = np.fmax(_reduce(np.fmax, temperature), _reduce(np.fmax, daily_temp_max))
+    wind_speed_max = _reduce(np.fmax, wind_speed)
+    precipitation_sum = _masked_sum(precipitation) + _masked_sum(daily_precip)
+    has_precipitation = (np.count_nonzero(~np.isnan(precipitation), axis=0) > 0) | (_lengths(daily_series["precipitation_sum"]) > 0)
+
+    averages = {}
+    for stat, field in (
+        ("precipitation_probability_avg", "precipitation_probability"),
+        ("pressure_avg", "pressure_msl"),
+        ("direct_radiation_avg", "direct_radiation"),
+    ):
+        averages[stat] = (_masked_sum(matrices[field]), _lengths(series[field]))
+
+    results = []
+    for index in range(len(weather_data_list)):
+        wind = wind_speed_max[index]
+        results.append({
+            "precipitation_sum": float(precipitation_sum[index]) if has_precipitation[index] else 0,
+            "temperature_min": None if np.isnan(temperature_min[index]) else float(temperature_min[index]),
+            "temperature_max": None if np.isnan(temperature_max[index]) else float(temperature_max[index]),
+            "wind_speed_max": float(wind) if wind > 0 else 0,
+            "precipitation_probability_avg": _average(*averages["precipitation_probability_avg"], index),
+            "pressure_avg": _average(*averages["pressure_avg"], index),
+            "direct_radiation_avg": _average(*averages["direct_radiation_avg"], index),
+        })
+    return results
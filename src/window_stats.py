@@ -0,0 +1,234 @@
+import os
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Hashable, Optional, Sequence
+
+import numpy as np
+
+# Horizontes das janelas, em horas a partir da hora atual (ex.: "6,24,72").
+STATS_WINDOWS = tuple(sorted({int(hours) for hours in os.getenv("STATS_WINDOWS", "6,24,72").split(",") if hours.strip()}))
+WINDOW_STATS_MAX_ENTRIES = int(os.getenv("WINDOW_STATS_MAX_ENTRIES", "8192"))
+
+# Campo horário acompanhado e se a janela mantém o mínimo e/ou o máximo dele.
+TRACKED_FIELDS = {
+    "temperature_2m": (True, True),
+    "precipitation": (False, False),
+    "windspeed_10m": (False, True),
+    "precipitation_probability": (False, False),
+    "pressure_msl": (False, False),
+    "direct_radiation": (False, False),
+}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def window_name(hours: int) -> str:
+    return f"{hours}h"
+
+
+WINDOW_NAMES = tuple(window_name(hours) for hours in STATS_WINDOWS)
+
+
+def hour_number(moment: datetime) -> int:
+    """Horas inteiras desde 1970, usadas para alinhar previsões consecutivas."""
+    return (moment.replace(tzinfo=None) - _EPOCH) // timedelta(hours=1)
+
+
+def _changed(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    return ~((old == new) | (np.isnan(old) & np.isnan(new)))
+
+
+class _Window:
+    """
+    Soma e contagem de um campo nas horas [início, início + `hours`), com
+    mínimo e máximo mantidos por deques monotônicas de horas.
+    """
+
+    def __init__(self, hours: int, track_min: bool, track_max: bool):
+        self.hours = hours
+        self.total = 0.0
+        self.count = 0
+        self.minima: Optional[Deque[int]] = deque() if track_min else None
+        self.maxima: Optional[Deque[int]] = deque() if track_max else None
+
+    def rebuild(self, values: np.ndarray, start: int) -> None:
+        window = values[:self.hours]
+        present = ~np.isnan(window)
+        self.total = float(window[present].sum())
+        self.count = int(present.sum())
+        self.rebuild_extremes(values, start, self.hours)
+
+    def rebuild_extremes(self, values: np.ndarray, start: int, length: int) -> None:
+        """Refaz as deques com as primeiras `length` horas de `values`."""
+        if self.minima is None and self.maxima is None:
+            return
+        for extremes in (self.minima, self.maxima):
+            if extremes is not None:
+                extremes.clear()
+        for offset in range(min(length, len(values))):
+            self._push_extremes(values, start, start + offset)
+
+    def _push_extremes(self, values: np.ndarray, start: int, hour: int) -> None:
+        value = values[hour - start]
+        if np.isnan(value):
+            return
+        if self.minima is not None:
+            while self.minima and values[self.minima[-1] - start] >= value:
+                self.minima.pop()
+            self.minima.append(hour)
+        if self.maxima is not None:
+            while self.maxima and values[self.maxima[-1] - start] <= value:
+                self.maxima.pop()
+            self.maxima.append(hour)
+
+    def push(self, values: np.ndarray, start: int, hour: int) -> None:
+        """Inclui a hora `hour` (a seguinte ao fim da janela)."""
+        value = values[hour - start]
+        if not np.isnan(value):
+            self.total += float(value)
+            self.count += 1
+            self._push_extremes(values, start, hour)
+
+    def evict(self, old_values: np.ndarray, old_start: int, new_start: int) -> None:
+        """Remove as horas anteriores a `new_start`, cujos valores estão em `old_values`."""
+        leaving = old_values[:min(new_start - old_start, self.hours)]
+        present = ~np.isnan(leaving)
+        self.total -= float(leaving[present].sum())
+        self.count -= int(present.sum())
+        for extremes in (self.minima, self.maxima):
+            while extremes and extremes[0] < new_start:
+                extremes.popleft()
+
+    def replace(self, old: np.ndarray, new: np.ndarray) -> None:
+        """Atualiza a soma e a contagem com valores revisados (NaN conta como ausente)."""
+        self.total += float(np.nansum(new) - np.nansum(old))
+        self.count += int(np.count_nonzero(~np.isnan(new)) - np.count_nonzero(~np.isnan(old)))
+
+    def average(self) -> float:
+        return round(self.total / self.count, 2) if self.count else 0
+
+
+def _extreme(extremes: Optional[Deque[int]], values: np.ndarray, start: int) -> Optional[float]:
+    return float(values[extremes[0] - start]) if extremes else None
+
+
+class RollingStats:
+    """
+    Estatísticas em janelas deslizantes (próximas 6 h, 24 h, 72 h…) da previsão
+    de um ponto. A cada atualização só as horas que saíram, entraram ou foram
+    revisadas alteram as somas e deques, então o custo acompanha a mudança e
+    não o horizonte inteiro.
+    """
+
+    def __init__(self, horizons: Sequence[int] = STATS_WINDOWS):
+        self.horizons = tuple(horizons)
+        self.span = max(self.horizons, default=0)
+        self.start: Optional[int] = None
+        self.values: Dict[str, np.ndarray] = {}
+        self.windows = {
+            field: [_Window(hours, *extremes) for hours in self.horizons]
+            for field, extremes in TRACKED_FIELDS.items()
+        }
+        self.source: Optional[dict] = None
+        self.result: Dict[str, dict] = {}
+
+    def _series(self, hourly: dict, first_hour: int, start: int) -> Dict[str, np.ndarray]:
+        offset = start - first_hour
+        series = {}
+        for field in TRACKED_FIELDS:
+            values = np.full(self.span, np.nan)
+            raw = (hourly.get(field) or [])[offset:offset + self.span]
+            if raw:
+                values[:len(raw)] = np.array(raw, dtype=float)
+            series[field] = values
+        return series
+
+    def update(self, weather_data: dict, now: Optional[datetime] = None) -> Dict[str, dict]:
+        """Atualiza as janelas com uma nova previsão e retorna as estatísticas de cada uma."""
+        hourly = weather_data.get("hourly") or {}
+        times = hourly.get("time")
+        if not times or not self.span:
+            return {}
+        now = now or datetime.utcnow() + timedelta(seconds=weather_data.get("utc_offset_seconds") or 0)
+        first_hour = hour_number(datetime.fromisoformat(times[0]))
+        start = max(hour_number(now), first_hour)
+        if weather_data is self.source and start == self.start:
+            return self.result
+
+        series = self._series(hourly, first_hour, start)
+        old_start, old_values = self.start, self.values
+        shift = None if old_start is None else start - old_start
+        for field, windows in self.windows.items():
+            new, old = series[field], old_values.get(field)
+            for window in windows:
+                if shift is None or shift < 0 or shift >= window.hours:
+                    window.rebuild(new, start)
+                    continue
+                window.evict(old, old_start, start)
+                # Horas que continuam na janela, comparadas com a previsão anterior.
+                overlap = window.hours - shift
+                before, after = old[shift:shift + overlap], new[:overlap]
+                if _changed(before, after).any():
+                    window.replace(before, after)
+                    window.rebuild_extremes(new, start, overlap)
+                for hour in range(start + overlap, start + window.hours):
+                    window.push(new, start, hour)
+
+        self.start, self.values, self.source = start, series, weather_data
+        self.result = {window_name(hours): self._summary(index) for index, hours in enumerate(self.horizons)}
+        return self.result
+
+    def _summary(self, index: int) -> dict:
+        temperature = self.windows["temperature_2m"][index]
+        precipitation = self.windows["precipitation"][index]
+        wind = self.windows["windspeed_10m"][index]
+        wind_speed_max = _extreme(wind.maxima, self.values["windspeed_10m"], self.start)
+        return {
+            "precipitation_sum": round(precipitation.total, 2) if precipitation.count else 0,
+            "temperature_min": _extreme(temperature.minima, self.values["temperature_2m"], self.start),
+            "temperature_max": _extreme(temperature.maxima, self.values["temperature_2m"], self.start),
+            "wind_speed_max": wind_speed_max if wind_speed_max and wind_speed_max > 0 else 0,
+            "precipitation_probability_avg": self.windows["precipitation_probability"][index].average(),
+            "pressure_avg": self.windows["pressure_msl"][index].average(),
+            "direct_radiation_avg": self.windows["direct_radiation"][index].average(),
+        }
+
+
+class WindowStatsStore:
+    """Estado das janelas de cada ponto, com remoção LRU acima de `max_entries`."""
+
+    def __init__(self, max_entries: int = WINDOW_STATS_MAX_ENTRIES, horizons: Sequence[int] = STATS_WINDOWS):
+        self.max_entries = max_entries
+        self.horizons = tuple(horizons)
+        self._entries: "OrderedDict[Hashable, RollingStats]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, key: Hashable, weather_data: dict, now: Optional[datetime] = None) -> Dict[str, dict]:
+        rolling = self._entries.get(key)
+        if rolling is None:
+            rolling = self._entries[key] = RollingStats(self.horizons)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return rolling.update(weather_data, now)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def window_city(city: dict, window: str) -> dict:
+    """
+    Cópia da cidade com as estatísticas da janela no lugar das do horizonte
+    completo. O nível de risco e os motivos continuam os do horizonte completo.
+    """
+    stats = dict(city.get("stats") or {})
+    windows = stats.pop("windows", None) or {}
+    if window in windows:
+        stats.update(windows[window], window=window)
+    return dict(city, stats=stats)
+
+
+window_stats = WindowStatsStore()
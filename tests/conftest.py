@@ -0,0 +1,35 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src import models
+from src.database import ensure_donation_version, ensure_fulltext_index
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    """Banco SQLite temporário com o esquema completo, como o init_db cria."""
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    ensure_fulltext_index(engine)
+    ensure_donation_version(engine)
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def open_session(database_path):
+    """Abre uma sessão assíncrona no banco temporário (dentro do event loop do teste)."""
+    @asynccontextmanager
+    async def session():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                yield db
+        finally:
+            await engine.dispose()
+
+    return session
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import PasswordHasher, PrincipalCache, ServerBusyError
+
+
+def test_password_hasher_runs_off_the_event_loop():
+    hasher = PasswordHasher(workers=2, max_pending=4)
+
+    async def main():
+        return await hasher._run(lambda: threading.current_thread().name)
+
+    assert asyncio.run(main()).startswith("password-hash")
+
+
+def test_password_hasher_rejects_work_beyond_the_queue():
+    hasher = PasswordHasher(workers=1, max_pending=2)
+    release = threading.Event()
+
+    async def main():
+        running = [asyncio.ensure_future(hasher._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ServerBusyError):
+            await hasher._run(release.wait)
+        release.set()
+        await asyncio.gather(*running)
+        return await hasher._run(lambda: "ok")
+
+    assert asyncio.run(main()) == "ok"
+
+
+def test_principal_cache_expiry_and_invalidation():
+    cache = PrincipalCache(ttl=60, max_entries=2)
+    alice, bob = SimpleNamespace(id=1), SimpleNamespace(id=2)
+
+    cache.set("token-a1", alice)
+    cache.set("token-a2", alice, token_expires_at=time.time() - 1)  # token já vencido
+    assert cache.get("token-a1") is alice
+    assert cache.get("token-a2") is None
+
+    cache.set("token-a2", alice)
+    cache.invalidate_user(alice.id)
+    assert cache.get("token-a1") is None and cache.get("token-a2") is None
+
+    for token in ("token-b1", "token-b2", "token-b3"):
+        cache.set(token, bob)
+    assert cache.get("token-b1") is None  # o mais antigo sai acima de max_entries
+    assert cache.get("token-b3") is bob
@@ -0,0 +1,66 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from src import services
+from src.spatial import donation_index
+
+PORTO_ALEGRE = (-30.03, -51.23)
+
+
+@pytest.fixture(autouse=True)
+def empty_index():
+    donation_index.clear()
+    yield
+    donation_index.clear()
+
+
+def _write(database_path, statement, *parameters):
+    """Alteração feita por outro worker, fora deste processo."""
+    with sqlite3.connect(database_path) as connection:
+        connection.execute(statement, parameters)
+
+
+def _insert(database_path, location_id, lat, lon):
+    _write(database_path,
+           "INSERT INTO donation_locations (id, name, location, latitude, longitude, state_key) VALUES (?, ?, ?, ?, ?, ?)",
+           location_id, f"Ponto {location_id}", "Porto Alegre - RS", lat, lon, "rio grande do sul")
+
+
+def test_index_follows_changes_made_by_other_workers(database_path, open_session):
+    async def nearest_ids():
+        async with open_session() as db:
+            return [location.id for location, _ in await services.find_nearest_donation_locations(db, *PORTO_ALEGRE, 5)]
+
+    _insert(database_path, 1, -30.0, -51.2)
+    assert asyncio.run(nearest_ids()) == [1]
+
+    _insert(database_path, 2, -30.03, -51.23)
+    assert asyncio.run(nearest_ids()) == [2, 1]
+
+    _write(database_path, "UPDATE donation_locations SET latitude = ?, longitude = ? WHERE id = ?", -29.0, -51.0, 2)
+    assert asyncio.run(nearest_ids()) == [1, 2]
+
+    _write(database_path, "DELETE FROM donation_locations WHERE id = ?", 1)
+    assert asyncio.run(nearest_ids()) == [2]
+
+
+def test_local_change_does_not_force_a_reload(database_path, open_session):
+    _insert(database_path, 1, -30.0, -51.2)
+
+    async def main():
+        async with open_session() as db:
+            await services.load_donation_index(db)
+            version = donation_index.version
+            _insert(database_path, 2, -30.03, -51.23)
+            await services._index_donation_location(db, 2, -30.03, -51.23)
+            assert donation_index.version == version + 1
+            _insert(database_path, 3, -29.0, -51.0)  # outro worker, sem aviso a este processo
+            _insert(database_path, 4, -28.0, -50.0)
+            await services._index_donation_location(db, 4, -28.0, -50.0)
+            assert donation_index.version == version + 1  # fica para a próxima consulta recarregar
+            index = await services.load_donation_index(db)
+            assert sorted(key for key, _ in index.nearest(*PORTO_ALEGRE, 10)) == [1, 2, 3, 4]
+
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+import asyncio
+import sqlite3
+
+from src import services
+
+LOCATIONS = [
+    (1, "Paróquia São José", "Rua A, 10, Porto Alegre - RS", "rio grande do sul", True),
+    (2, "Escola Estadual", "Av. B, 200, Canoas - RS", "rio grande do sul", False),
+    (3, "Ginásio Municipal", "Rua C, 5, Florianópolis - SC", "santa catarina", True),
+    (4, "Centro Comunitário", "Rua D, 7, Pelotas - RS", "rio grande do sul", True),
+    (5, "Paróquia Santa Rita", "Rua E, 9, Caxias do Sul - RS", "rio grande do sul", True),
+]
+
+
+def _execute(database_path, statement, *parameters):
+    with sqlite3.connect(database_path) as connection:
+        connection.execute(statement, parameters)
+
+
+def _seed(database_path):
+    for location in LOCATIONS:
+        _execute(database_path,
+                 "INSERT INTO donation_locations (id, name, location, state_key, food) VALUES (?, ?, ?, ?, ?)", *location)
+
+
+def _ids(open_session, **filters):
+    async def main():
+        async with open_session() as db:
+            return [location.id for location in await services.list_donation_locations(db, **filters)]
+
+    return asyncio.run(main())
+
+
+def test_fulltext_index_follows_inserts_updates_and_deletes(database_path, open_session):
+    _seed(database_path)
+    assert _ids(open_session, q="paroquia") == [1, 5]  # sem acento e por prefixo
+    assert _ids(open_session, q="canoas") == [2]
+
+    _execute(database_path, "UPDATE donation_locations SET name = ? WHERE id = ?", "Paróquia do Bairro", 2)
+    assert _ids(open_session, q="paroquia") == [1, 2, 5]
+    assert _ids(open_session, q="escola") == []
+
+    _execute(database_path, "DELETE FROM donation_locations WHERE id = ?", 1)
+    assert _ids(open_session, q="paroquia") == [2, 5]
+    assert _ids(open_session, q='"sao') == []  # aspas no texto não quebram a consulta
+
+
+def test_keyset_pages_cover_every_match_once(database_path, open_session):
+    _seed(database_path)
+    pages, after = [], None
+    while True:
+        page = _ids(open_session, state="RS", food=True, after=after, limit=2)
+        if not page:
+            break
+        pages.append(page)
+        after = page[-1]
+    assert pages == [[1, 4], [5]]
+    assert _ids(open_session, state="Santa Catarina") == [3]
@@ -0,0 +1,76 @@
+import asyncio
+
+from src.services import ForecastCache
+
+KEY = ForecastCache.key(-30.03, -51.23)
+
+
+def _cache(ttl=60.0, stale_ttl=60.0):
+    return ForecastCache(ttl, stale_ttl, max_entries=16)
+
+
+def test_concurrent_callers_share_one_fetch():
+    cache, calls = _cache(), []
+
+    async def loader():
+        calls.append(KEY)
+        await asyncio.sleep(0.01)
+        return {"hourly": {}}
+
+    async def main():
+        return await asyncio.gather(*(cache.get(KEY, loader) for _ in range(20)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_get_many_batches_missing_keys_and_joins_inflight_ones():
+    cache, batches = _cache(), []
+    other = ForecastCache.key(-29.68, -53.8)
+
+    async def loader_many(keys):
+        batches.append(list(keys))
+        await asyncio.sleep(0.01)
+        return [{"key": key} for key in keys]
+
+    async def main():
+        first = asyncio.ensure_future(cache.get_many([KEY], loader_many))
+        await asyncio.sleep(0)
+        second = await cache.get_many([KEY, other, other], loader_many)
+        return await first, second
+
+    first, second = asyncio.run(main())
+    assert batches == [[KEY], [other]]
+    assert first == [{"key": KEY}] and second == [{"key": KEY}, {"key": other}, {"key": other}]
+
+
+def test_stale_entry_is_served_while_revalidating():
+    cache, calls = _cache(ttl=0.0), []
+    cache.set(KEY, {"version": 1})
+
+    async def loader():
+        calls.append(KEY)
+        return {"version": 2}
+
+    async def main():
+        stale = await cache.get(KEY, loader)
+        await asyncio.sleep(0.01)
+        return stale, cache.lookup(KEY)[0]
+
+    assert asyncio.run(main()) == ({"version": 1}, {"version": 2})
+    assert len(calls) == 1
+
+
+def test_failed_fetch_is_not_cached():
+    cache, calls = _cache(), []
+
+    async def loader_many(keys):
+        calls.append(keys)
+        raise RuntimeError("API fora do ar")
+
+    async def main():
+        return await cache.get_many([KEY], loader_many), await cache.get_many([KEY], loader_many)
+
+    assert asyncio.run(main()) == ([None], [None])
+    assert len(calls) == 2
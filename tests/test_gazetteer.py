@@ -0,0 +1,28 @@
+import numpy as np
+
+from src.gazetteer import Gazetteer
+
+
+def make_gazetteer() -> Gazetteer:
+    rows = [
+        ("Bom Jesus", "Piauí", -9.07, -44.36, 25000.0),
+        ("Bom Jesus", "Rio Grande do Sul", -28.67, -50.43, 11000.0),
+        ("Canoas", "Rio Grande do Sul", -29.92, -51.18, 340000.0),
+    ]
+    city, admin_name, lat, lng, population = zip(*rows)
+    return Gazetteer(np.array(city), np.array(admin_name), np.array(["Brazil"] * len(rows)),
+                     np.array(lat), np.array(lng), np.array(population))
+
+
+def test_geocode_restricts_match_to_state_in_address():
+    gazetteer = make_gazetteer()
+
+    assert gazetteer.geocode("Rua A, 10, Bom Jesus - RS") == 1
+    assert gazetteer.geocode("Rua A, 10, Bom Jesus, Piauí") == 0
+
+
+def test_geocode_without_state_matches_name_only():
+    gazetteer = make_gazetteer()
+
+    assert gazetteer.geocode("Rua A, 10, Bom Jesus") == 0
+    assert gazetteer.geocode("Rua A, 10, Canoas - SC") is None
@@ -0,0 +1,43 @@
+import asyncio
+
+from src import services
+from src.services import ForecastCache, apply_statistics, grid_key
+
+FORECAST = {"hourly": {"time": ["2024-05-01T00:00", "2024-05-01T01:00"], "temperature_2m": [20.0, 22.0],
+                       "precipitation": [0.0, 1.5], "windspeed_10m": [10.0, 12.0],
+                       "precipitation_probability": [10, 20], "pressure_msl": [1013.0, 1012.0],
+                       "direct_radiation": [0.0, 100.0]}}
+
+
+def test_grid_key_snaps_to_the_cell_center():
+    assert grid_key(-30.03, -51.23, 0.1) == grid_key(-29.98, -51.18, 0.1) == (-30.0, -51.2)
+    assert grid_key(-30.03, -51.23, 0.1) != grid_key(-30.07, -51.23, 0.1)
+    assert grid_key(-30.03, -51.23, 0) == (-30.03, -51.23)
+
+
+def test_cities_in_the_same_cell_share_one_request(monkeypatch):
+    requested = []
+
+    async def fake_request(keys):
+        requested.append(list(keys))
+        return [dict(FORECAST) for _ in keys]
+
+    monkeypatch.setattr(services, "forecast_cache", ForecastCache(60, 60, 16))
+    monkeypatch.setattr(services, "_request_weather_data_batch", fake_request)
+    coordinates = [(-30.03, -51.23), (-29.98, -51.18), (-29.68, -53.8)]
+
+    forecasts = asyncio.run(services.fetch_weather_data_batch(coordinates))
+
+    assert len(requested) == 1 and len(requested[0]) == 2
+    assert forecasts[0] is forecasts[1] and forecasts[2] is not None
+
+
+def test_cities_in_the_same_cell_share_statistics():
+    cities = [{"city": "A", "lat": -30.03, "lon": -51.23}, {"city": "B", "lat": -29.98, "lon": -51.18},
+              {"city": "C", "lat": -29.68, "lon": -53.8}]
+
+    cities = apply_statistics(cities, [FORECAST, FORECAST, None])
+
+    assert cities[0]["stats"] is cities[1]["stats"]
+    assert cities[0]["stats"]["temperature_max"] == 22.0
+    assert cities[2]["stats"] == {}
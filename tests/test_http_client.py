@@ -0,0 +1,93 @@
+import asyncio
+
+from aiohttp import web
+
+from src import http_client as http_client_module
+from src.http_client import HttpClient, TokenBucket
+
+
+async def _serve(statuses):
+    """Servidor local que responde com os status de `statuses`, em ordem; retorna a URL e as chamadas recebidas."""
+    calls = []
+
+    async def handler(request):
+        calls.append(request.path)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        if status == 200:
+            return web.json_response({"ok": True})
+        return web.Response(status=status)
+
+    app = web.Application()
+    app.router.add_get("/forecast", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}/forecast", calls
+
+
+def test_retries_server_errors_then_returns_json(monkeypatch):
+    monkeypatch.setattr(http_client_module, "HTTP_BACKOFF_BASE", 0.01)
+
+    async def main():
+        runner, url, calls = await _serve([503, 500, 200])
+        client = HttpClient(max_retries=3)
+        try:
+            return await client.get_json(url), len(calls)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    assert asyncio.run(main()) == ({"ok": True}, 3)
+
+
+def test_gives_up_after_max_retries_and_skips_client_errors(monkeypatch):
+    monkeypatch.setattr(http_client_module, "HTTP_BACKOFF_BASE", 0.01)
+
+    async def main():
+        results = []
+        for statuses in ([503], [404]):
+            runner, url, calls = await _serve(statuses)
+            client = HttpClient(max_retries=2)
+            try:
+                results.append((await client.get_json(url), len(calls)))
+            finally:
+                await client.close()
+                await runner.cleanup()
+        return results
+
+    assert asyncio.run(main()) == [(None, 3), (None, 1)]
+
+
+def test_token_bucket_allows_a_burst_then_paces_requests():
+    bucket = TokenBucket(rate_per_minute=1200, burst=3)  # uma ficha a cada 50 ms
+
+    async def main():
+        return [await bucket.acquire() for _ in range(5)]
+
+    waits = asyncio.run(main())
+    assert all(wait < 0.02 for wait in waits[:3])
+    assert all(0.03 < wait < 0.2 for wait in waits[3:])
+
+
+def test_retries_are_charged_to_the_budget(monkeypatch):
+    monkeypatch.setattr(http_client_module, "HTTP_BACKOFF_BASE", 0.01)
+    acquired = []
+
+    class CountingBucket(TokenBucket):
+        async def acquire(self):
+            acquired.append(1)
+            return await super().acquire()
+
+    async def main():
+        runner, url, calls = await _serve([503, 200])
+        client = HttpClient(max_retries=3, budget=CountingBucket(rate_per_minute=6000, burst=10))
+        try:
+            return await client.get_json(url), len(calls)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    assert asyncio.run(main()) == ({"ok": True}, 2)
+    assert len(acquired) == 2
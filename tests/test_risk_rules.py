@@ -0,0 +1,73 @@
+import numpy as np
+
+from src.risk_rules import HOURLY_RULES, CompiledRules, RiskRule, _rolling, assess_statistics, find_risk_windows, load_rules
+
+
+def test_window_sum_exactly_on_threshold():
+    rules = CompiledRules([RiskRule("chuva", "precipitation", ">=", 6, window=3, aggregate="sum")])
+    weather_data = {"hourly": {"time": ["2024-05-01T00:00", "2024-05-01T01:00", "2024-05-01T02:00"],
+                               "precipitation": [1.9, 0.8, 3.3]}}
+
+    [windows] = find_risk_windows([weather_data], compiled=rules)
+
+    assert [(window["rule"], window["start"], window["end"]) for window in windows] == [
+        ("chuva", "2024-05-01T00:00", "2024-05-01T02:00")
+    ]
+
+
+def test_rolling_sum_and_mean_match_window_by_window():
+    rng = np.random.default_rng(0)
+    matrix = np.round(rng.uniform(0, 10, size=(48, 5)), 1)
+    matrix[rng.random(matrix.shape) < 0.1] = np.nan
+    for window in (1, 3, 24):
+        sums, means = _rolling(matrix, window, "sum"), _rolling(matrix, window, "mean")
+        for hour in range(matrix.shape[0]):
+            values = matrix[max(0, hour - window + 1):hour + 1]
+            expected_sum = np.nansum(values, axis=0)
+            with np.errstate(invalid="ignore"):
+                expected_mean = expected_sum / np.count_nonzero(~np.isnan(values), axis=0)
+            missing = np.isnan(matrix[hour])
+            np.testing.assert_allclose(sums[hour][~missing], expected_sum[~missing])
+            np.testing.assert_allclose(means[hour][~missing], expected_mean[~missing])
+            assert np.isnan(sums[hour][missing]).all()
+
+
+def baseline_assess_risk(stats: dict):
+    """Limites fixos usados antes das regras configuráveis, como referência."""
+    reasons = []
+    if stats["precipitation_sum"] >= 50:
+        reasons.append("alta precipitação")
+    if stats["wind_speed_max"] >= 50:
+        reasons.append("alta velocidade do vento")
+    if stats["temperature_max"] is not None and stats["temperature_max"] >= 40:
+        reasons.append("temperatura máxima alta")
+    if stats["temperature_min"] is not None and stats["temperature_min"] < -5:
+        reasons.append("temperatura mínima baixa")
+    if stats["pressure_avg"] <= 900:
+        reasons.append("baixa pressão atmosférica")
+    if stats["direct_radiation_avg"] >= 500:
+        reasons.append("alta radiação solar direta")
+    return ("PERIGO" if reasons else "SEGURO"), reasons
+
+
+def test_default_rules_match_previous_thresholds():
+    rng = np.random.default_rng(1)
+    statistics = []
+    for _ in range(2000):
+        statistics.append({
+            "precipitation_sum": float(rng.choice([0, 49.99, 50, 80])),
+            "wind_speed_max": float(rng.choice([0, 49.9, 50, 70])),
+            "temperature_max": rng.choice([None, 39.9, 40.0]),
+            "temperature_min": rng.choice([None, -5.0, -5.1, 10.0]),
+            "pressure_avg": float(rng.choice([0, 900, 900.1, 1013])),
+            "direct_radiation_avg": float(rng.choice([0, 499.9, 500])),
+        })
+
+    assert assess_statistics(statistics) == [baseline_assess_risk(stats) for stats in statistics]
+
+
+def test_hourly_rules_are_opt_in():
+    assert all(rule.window == 0 for rule in load_rules(None, hourly=False))
+    rules = load_rules(None, hourly=True)
+    assert {rule.name for rule in HOURLY_RULES} <= {rule.name for rule in rules}
+    assert len({rule.name for rule in rules}) == len(rules)
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from src.scheduler import Region, SweepScheduler
+
+INTERVALS = {"SEGURO": 900.0, "ATENÇÃO": 600.0, "PERIGO": 300.0}
+
+
+def test_due_regions_by_severity_then_population():
+    regions = [
+        Region("santa catarina", "Santa Catarina", population=7.0),
+        Region("sao paulo", "São Paulo", population=46.0),
+        Region("rio grande do sul", "Rio Grande do Sul", population=11.0, severity="PERIGO"),
+    ]
+    scheduler = SweepScheduler(regions, INTERVALS)
+    assert [region.key for region in scheduler.due(now=0)] == ["rio grande do sul", "sao paulo", "santa catarina"]
+
+
+def test_refresh_interval_follows_severity():
+    region = Region("rio grande do sul", "Rio Grande do Sul")
+    scheduler = SweepScheduler([region], INTERVALS)
+    scheduler.mark_refreshed(region, "PERIGO", 1000.0)
+    assert region.next_due == 1300.0
+    scheduler.mark_refreshed(region, "SEGURO", 1000.0)
+    assert region.next_due == 1900.0
+
+
+def test_failed_refresh_is_retried_after_retry_interval():
+    region = Region("rio grande do sul", "Rio Grande do Sul")
+    scheduler = SweepScheduler([region], INTERVALS, max_parallel=1, retry_interval=0.05)
+    attempts = []
+
+    async def refresh(region):
+        attempts.append(time.time())
+        if len(attempts) == 1:
+            raise RuntimeError("API fora do ar")
+        scheduler.mark_refreshed(region, "ATENÇÃO", time.time())
+
+    async def main():
+        task = asyncio.create_task(scheduler.run(refresh))
+        while len(attempts) < 2:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.3)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(main(), timeout=5))
+    assert len(attempts) == 2  # a região fica em dia após a nova tentativa
+    assert attempts[1] - attempts[0] >= 0.05
+    assert region.severity == "ATENÇÃO" and region.next_due - attempts[1] >= 599
+    assert not region.refreshing
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src import models, shared_snapshot, snapshot
+from src.scheduler import SweepScheduler, region_from_name
+from src.snapshot import (REGION_INTERVALS, RS_REGION, SharedSnapshotSync, SnapshotStore, SnapshotUnavailable,
+                          get_snapshot, save_shared_snapshot)
+
+CITIES = [{"city": "Porto Alegre", "state": "Rio Grande do Sul", "stats": {"risk_level": "SEGURO"}}]
+
+
+def test_lease_passes_to_another_worker_when_it_expires(tmp_path):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'leases.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(models.SnapshotLease.__table__.create)
+        try:
+            async with AsyncSession(engine) as db:
+                assert await shared_snapshot.acquire_lease(db, "leader", ttl=60)
+                assert not await shared_snapshot.acquire_lease(db, "follower", ttl=60)
+                assert await shared_snapshot.acquire_lease(db, "leader", ttl=-1)  # renovação que já expirou
+                assert await shared_snapshot.acquire_lease(db, "follower", ttl=60)
+                assert not await shared_snapshot.acquire_lease(db, "leader", ttl=60)
+                await shared_snapshot.release_lease(db, "follower")
+                assert await shared_snapshot.acquire_lease(db, "leader", ttl=60)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_follower_loads_leader_file_regardless_of_local_version(tmp_path):
+    """As versões são contadas por processo; um seguidor com contador maior ainda carrega o arquivo novo."""
+    region = region_from_name(RS_REGION.admin_name)
+    path = str(tmp_path / "weather_snapshot.bin")
+
+    async def main():
+        leader, follower = SnapshotStore(), SnapshotStore()
+        for _ in range(3):
+            follower.publish(CITIES)
+        published = leader.publish([dict(CITIES[0], stats={"risk_level": "PERIGO"})])
+        sync = SharedSnapshotSync(path, {region.key: follower}, SweepScheduler([region], REGION_INTERVALS))
+        save_shared_snapshot(sync.region_path(region), published)
+
+        loaded = await sync.load_if_changed(region)
+        assert loaded is not None and follower.current is loaded
+        assert loaded.body.etag == published.body.etag
+        assert region.severity == "PERIGO"
+        assert await sync.load_if_changed(region) is None  # arquivo inalterado
+
+    asyncio.run(main())
+
+
+def test_follower_without_file_does_not_sweep(tmp_path, monkeypatch):
+    sweeps = []
+
+    async def fake_sweep_region(admin_name, max_age=None):
+        sweeps.append(admin_name)
+        return [dict(city) for city in CITIES], [None]
+
+    monkeypatch.setattr(snapshot, "sweep_region", fake_sweep_region)
+    monkeypatch.setitem(snapshot.region_snapshots, RS_REGION.key, SnapshotStore())
+    monkeypatch.setattr(shared_snapshot, "SHARED_SNAPSHOT_PATH", str(tmp_path / "weather_snapshot.bin"))
+    monkeypatch.setattr(snapshot, "SNAPSHOT_WAIT_TIMEOUT", 0.01)
+
+    with pytest.raises(SnapshotUnavailable):
+        asyncio.run(get_snapshot(RS_REGION))
+    assert sweeps == []
@@ -0,0 +1,36 @@
+import asyncio
+
+from src import shared_snapshot, snapshot
+from src.snapshot import RS_REGION, SnapshotStore, get_snapshot
+
+CITIES = [{"city": "Porto Alegre", "state": "Rio Grande do Sul", "stats": {"risk_level": "SEGURO"}}]
+
+
+def test_cold_cache_requests_share_one_sweep(monkeypatch):
+    """Requisições simultâneas sem snapshot publicado fazem uma única varredura e não gravam histórico."""
+    sweeps, recorded = [], []
+
+    async def fake_sweep_region(admin_name, max_age=None):
+        sweeps.append(admin_name)
+        await asyncio.sleep(0.01)
+        return [dict(city) for city in CITIES], [None]
+
+    async def fake_persist(region, cities, forecasts, recorded_at, record_history=True):
+        recorded.append(record_history)
+
+    store = SnapshotStore()
+    monkeypatch.setattr(snapshot, "sweep_region", fake_sweep_region)
+    monkeypatch.setattr(snapshot, "_persist_sweep", fake_persist)
+    monkeypatch.setitem(snapshot.region_snapshots, RS_REGION.key, store)
+    monkeypatch.setattr(shared_snapshot, "SHARED_SNAPSHOT_PATH", None)
+
+    async def main():
+        return await asyncio.gather(*(get_snapshot(RS_REGION) for _ in range(10)))
+
+    results = asyncio.run(main())
+
+    assert len(sweeps) == 1
+    assert recorded == [False]
+    assert {result.version for result in results} == {1}
+    assert store.version == 1
+    assert not store.refreshing
@@ -0,0 +1,95 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from starlette.datastructures import Headers
+
+from src.uploads import BodySizeLimitMiddleware, UnsupportedUploadTypeError, UploadTooLargeError, store_upload
+
+BOUNDARY = "limite"
+
+
+def _upload(content: bytes, content_type: str = "image/png", filename: str = "foto.PNG") -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename=filename, headers=Headers({"content-type": content_type}))
+
+
+def _multipart(content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"foto.png\"\r\n"
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _call(app, body: bytes, chunk_size: int = 1024, content_length: bool = True):
+    """Envia o corpo em blocos diretamente à aplicação ASGI; retorna o status e quantos blocos foram lidos."""
+    chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)]
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {"type": "http", "method": "POST", "path": "/upload", "raw_path": b"/upload", "query_string": b"",
+             "headers": headers, "http_version": "1.1", "scheme": "http", "root_path": "",
+             "server": ("test", 80), "client": ("test", 1)}
+    read, statuses = [0], []
+
+    async def receive():
+        if read[0] < len(chunks):
+            read[0] += 1
+            return {"type": "http.request", "body": chunks[read[0] - 1], "more_body": read[0] < len(chunks)}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    asyncio.run(app(scope, receive, send))
+    return statuses[0], read[0], len(chunks)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, paths=("/upload",), max_bytes=4096)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"path": await store_upload(file, directory=str(tmp_path), max_bytes=4096)}
+
+    return app
+
+
+def test_declared_oversized_body_is_rejected_before_reading(app):
+    status, read, _ = _call(app, _multipart(b"x" * 10000))
+    assert status == 413 and read == 0
+
+
+def test_streamed_oversized_body_stops_at_the_limit(app):
+    status, read, total = _call(app, _multipart(b"x" * 10000), content_length=False)
+    assert status == 413 and read < total
+
+
+def test_body_within_limit_is_stored(app):
+    status, read, total = _call(app, _multipart(b"x" * 1000), content_length=False)
+    assert status == 200 and read == total
+
+
+def test_store_upload_deduplicates_by_content(tmp_path):
+    async def main():
+        first = await store_upload(_upload(b"abc"), directory=str(tmp_path), chunk_size=2)
+        second = await store_upload(_upload(b"abc"), directory=str(tmp_path))
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second and first.endswith(".png")
+    with open(first, "rb") as stored:
+        assert stored.read() == b"abc"
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".part")]
+
+
+def test_store_upload_rejects_size_and_type(tmp_path):
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(store_upload(_upload(b"x" * 100), directory=str(tmp_path), max_bytes=10, chunk_size=8))
+    with pytest.raises(UnsupportedUploadTypeError):
+        asyncio.run(store_upload(_upload(b"x", content_type="text/html"), directory=str(tmp_path)))
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names]
@@ -0,0 +1,88 @@
+import random
+
+from src.services import calculate_statistics
+from src.weather_stats import HOURLY_FIELDS, calculate_statistics_batch
+
+STAT_FIELDS = (
+    "precipitation_sum", "temperature_min", "temperature_max", "wind_speed_max",
+    "precipitation_probability_avg", "pressure_avg", "direct_radiation_avg",
+)
+
+
+def baseline_statistics(weather_data: dict) -> dict:
+    """Implementação original, cidade a cidade, usada como referência."""
+    stats = {
+        "precipitation_sum": 0,
+        "temperature_min": float('inf'),
+        "temperature_max": float('-inf'),
+        "wind_speed_max": 0,
+        "precipitation_probability_avg": 0,
+        "pressure_avg": 0,
+        "direct_radiation_avg": 0,
+    }
+    hourly_data = weather_data.get("hourly", {})
+    for temp, precip, wind_speed, precipitation_probability, pressure, direct_radiation in zip(
+            hourly_data['temperature_2m'], hourly_data['precipitation'], hourly_data['windspeed_10m'],
+            hourly_data['precipitation_probability'], hourly_data['pressure_msl'], hourly_data['direct_radiation']):
+        if temp is not None:
+            stats["temperature_min"] = min(stats["temperature_min"], temp)
+            stats["temperature_max"] = max(stats["temperature_max"], temp)
+        if precip is not None:
+            stats["precipitation_sum"] += precip
+        if wind_speed is not None:
+            stats["wind_speed_max"] = max(stats["wind_speed_max"], wind_speed)
+        if precipitation_probability is not None:
+            stats["precipitation_probability_avg"] += precipitation_probability
+        if pressure is not None:
+            stats["pressure_avg"] += pressure
+        if direct_radiation is not None:
+            stats["direct_radiation_avg"] += direct_radiation
+
+    daily_data = weather_data.get("daily", {})
+    if daily_data:
+        if daily_data.get("temperature_2m_min"):
+            stats["temperature_min"] = min(stats["temperature_min"], min(daily_data["temperature_2m_min"]))
+        if daily_data.get("temperature_2m_max"):
+            stats["temperature_max"] = max(stats["temperature_max"], max(daily_data["temperature_2m_max"]))
+        if daily_data.get("precipitation_sum"):
+            stats["precipitation_sum"] += sum(daily_data["precipitation_sum"])
+
+    if stats["temperature_min"] == float('inf'):
+        stats["temperature_min"] = None
+    if stats["temperature_max"] == float('-inf'):
+        stats["temperature_max"] = None
+    for stat, field in (("precipitation_probability_avg", "precipitation_probability"),
+                        ("pressure_avg", "pressure_msl"), ("direct_radiation_avg", "direct_radiation")):
+        if len(hourly_data[field]) > 0:
+            stats[stat] = round(stats[stat] / len(hourly_data[field]), 2)
+    return stats
+
+
+def random_forecast(rng: random.Random) -> dict:
+    hours, days = rng.randint(1, 168), rng.randint(0, 7)
+    hourly = {
+        field: [None if rng.random() < 0.05 else round(rng.uniform(0, 1000), 1) for _ in range(hours)]
+        for field in HOURLY_FIELDS
+    }
+    daily = {
+        "temperature_2m_min": [round(rng.uniform(-10, 20), 1) for _ in range(days)],
+        "temperature_2m_max": [round(rng.uniform(10, 40), 1) for _ in range(days)],
+        "precipitation_sum": [round(rng.uniform(0, 80), 1) for _ in range(days)],
+    }
+    return {"hourly": hourly, "daily": daily}
+
+
+def test_single_city_matches_baseline_exactly():
+    rng = random.Random(0)
+    for _ in range(300):
+        weather_data = random_forecast(rng)
+        expected = baseline_statistics(weather_data)
+        stats = calculate_statistics(weather_data)
+        assert {field: stats[field] for field in STAT_FIELDS} == expected
+
+
+def test_batch_matches_baseline_exactly():
+    rng = random.Random(1)
+    forecasts = [random_forecast(rng) for _ in range(50)]
+    for stats, weather_data in zip(calculate_statistics_batch(forecasts), forecasts):
+        assert {field: stats[field] for field in STAT_FIELDS} == baseline_statistics(weather_data)
@@ -0,0 +1,64 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.window_stats import TRACKED_FIELDS, RollingStats, WindowStatsStore
+
+START = datetime(2024, 5, 1)
+HOURS = 168
+
+
+def _forecast(rng: random.Random, first_hour: int, previous: dict = None) -> dict:
+    """Previsão sintética a partir de `first_hour`; com `previous`, revisa só parte das horas."""
+    times = [(START + timedelta(hours=first_hour + hour)).isoformat(timespec="minutes") for hour in range(HOURS)]
+    hourly = {"time": times}
+    for field in TRACKED_FIELDS:
+        old = dict(zip(previous["hourly"]["time"], previous["hourly"][field])) if previous else {}
+        values = []
+        for time in times:
+            if time in old and rng.random() < 0.8:
+                values.append(old[time])
+            elif rng.random() < 0.05:
+                values.append(None)
+            else:
+                values.append(round(rng.uniform(-10, 60), 1))
+        hourly[field] = values
+    return {"hourly": hourly}
+
+
+def test_incremental_windows_match_full_recomputation():
+    rng = random.Random(7)
+    store = WindowStatsStore(horizons=(6, 24, 72))
+    forecast, first_hour, now = None, 0, START
+    for step in range(40):
+        if rng.random() < 0.5:
+            first_hour += rng.choice([0, 1, 3, 6])
+            forecast = _forecast(rng, first_hour, forecast)
+        now += timedelta(hours=rng.choice([0, 1, 2, 30]))
+        incremental = store.update("cell", forecast, now)
+        expected = RollingStats((6, 24, 72)).update(forecast, now)
+        assert incremental.keys() == expected.keys()
+        for window, stats in expected.items():
+            for name, value in stats.items():
+                assert incremental[window][name] == pytest.approx(value, abs=0.011), (step, window, name)
+
+
+def test_window_sum_matches_the_hours_in_the_window():
+    forecast = _forecast(random.Random(1), 0)
+    now = START + timedelta(hours=5)
+    stats = RollingStats((6, 24)).update(forecast, now)
+    for hours, name in ((6, "6h"), (24, "24h")):
+        window = [value for value in forecast["hourly"]["precipitation"][5:5 + hours] if value is not None]
+        assert stats[name]["precipitation_sum"] == pytest.approx(round(sum(window), 2))
+        temperatures = [value for value in forecast["hourly"]["temperature_2m"][5:5 + hours] if value is not None]
+        assert stats[name]["temperature_max"] == max(temperatures)
+        assert stats[name]["temperature_min"] == min(temperatures)
+
+
+def test_store_evicts_least_recently_used_points():
+    forecast = _forecast(random.Random(2), 0)
+    store = WindowStatsStore(max_entries=2, horizons=(6,))
+    for key in ("a", "b", "a", "c"):
+        store.update(key, forecast, START)
+    assert len(store) == 2 and set(store._entries) == {"a", "c"}